@@ -0,0 +1,31 @@
+import os
+import sys
+from Crypto.Cipher import AES
+from bench_xor import label, throughput
+from soln_10 import enc_cbc, dec_cbc
+
+SIZES = [
+    1 << 10,
+    64 << 10,
+    1 << 20,
+    16 << 20,
+]
+
+if __name__ == "__main__":
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    key = os.urandom(16)
+    iv = os.urandom(16)
+    print(f"{'size':>8} {'enc_cbc':>10} {'MODE_CBC':>10} {'dec_cbc':>10} {'MODE_CBC':>10}  (MB/s)")
+    for size in SIZES:
+        if size > max_size:
+            break
+        ptxt = os.urandom(size)
+        ctxt = AES.new(key, AES.MODE_CBC, iv).encrypt(ptxt)
+        assert enc_cbc(ptxt, key, iv) == ctxt
+        assert dec_cbc(ctxt, key, iv) == ptxt
+
+        enc = throughput(lambda: enc_cbc(ptxt, key, iv), size)
+        enc_ref = throughput(lambda: AES.new(key, AES.MODE_CBC, iv).encrypt(ptxt), size)
+        dec = throughput(lambda: dec_cbc(ctxt, key, iv), size)
+        dec_ref = throughput(lambda: AES.new(key, AES.MODE_CBC, iv).decrypt(ctxt), size)
+        print(f"{label(size):>8} {enc:10.1f} {enc_ref:10.1f} {dec:10.1f} {dec_ref:10.1f}")
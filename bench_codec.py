@@ -0,0 +1,50 @@
+import codecs
+import io
+import os
+from bench_xor import label, throughput
+from tools import decode_base64, decode_hex, encode_base64, encode_hex, iter_base64, iter_hex
+
+# The codecs-based implementations the tools functions replaced.
+def codecs_decode_hex(s: str):
+    return codecs.decode(s, 'hex')
+
+def codecs_encode_hex(s: bytes):
+    return codecs.encode(s, 'hex')
+
+def codecs_encode_base64(bs: bytes):
+    b64 = codecs.encode(bs, 'base64').decode()
+    return b64.replace("\n", "")
+
+def codecs_decode_base64(s: str):
+    b64 = s.encode('utf-8')
+    return codecs.decode(b64, 'base64')
+
+SIZES = [
+    1 << 10,
+    64 << 10,
+    1 << 20,
+    16 << 20,
+]
+
+if __name__ == "__main__":
+    print(f"{'size':>8} {'operation':<16} {'codecs':>10} {'binascii':>10}  (MB/s of raw bytes)")
+    for size in SIZES:
+        raw = os.urandom(size)
+        hex_str = encode_hex(raw).decode()
+        # Wrapped the way the data files are.
+        b64_str = codecs.encode(raw, 'base64').decode()
+        hex_bytes = hex_str.encode()
+        b64_bytes = b64_str.encode()
+        cases = [
+            ("encode_hex", lambda: codecs_encode_hex(raw), lambda: encode_hex(raw)),
+            ("decode_hex", lambda: codecs_decode_hex(hex_str), lambda: decode_hex(hex_str)),
+            ("encode_base64", lambda: codecs_encode_base64(raw), lambda: encode_base64(raw)),
+            ("decode_base64", lambda: codecs_decode_base64(b64_str), lambda: decode_base64(b64_str)),
+            ("iter_hex", lambda: codecs_decode_hex(hex_str),
+             lambda: b"".join(iter_hex(io.BytesIO(hex_bytes)))),
+            ("iter_base64", lambda: codecs_decode_base64(b64_str),
+             lambda: b"".join(iter_base64(io.BytesIO(b64_bytes)))),
+        ]
+        for name, reference, current in cases:
+            assert reference() == current()
+            print(f"{label(size):>8} {name:<16} {throughput(reference, size):10.1f} {throughput(current, size):10.1f}")
@@ -0,0 +1,73 @@
+import argparse
+import time
+import soln_12
+import soln_13
+import soln_14
+import soln_16
+from oracle_harness import MeteredOracle, RemoteOracle
+
+def check_soln_12(oracle, ptxt):
+    """Checks a recovered target string."""
+    return ptxt == soln_12.Oracle().suffix
+
+def check_soln_12_cached(oracle, result):
+    """Checks a recovered target string returned with a query count."""
+    return check_soln_12(oracle, result[0])
+
+def check_soln_13(oracle, ctxt):
+    """Checks that a forged profile has the admin role."""
+    return soln_13.parse_key_value(oracle.dec_profile(ctxt))["role"] == "admin"
+
+def check_soln_16(oracle, ctxt):
+    """Checks that a forged ciphertext is accepted as admin."""
+    return oracle.is_admin(ctxt)
+
+# (name, oracle class, oracle arguments, attack, check)
+ATTACKS = [
+    ("soln_12.decrypt_target", soln_12.Oracle, (), soln_12.decrypt_target, check_soln_12),
+    ("soln_12.decrypt_target_cached", soln_12.Oracle, (), soln_12.decrypt_target_cached, check_soln_12_cached),
+    ("soln_13.build_enc_admin_profile", soln_13.Oracle, (), soln_13.build_enc_admin_profile, check_soln_13),
+    ("soln_14.decrypt_target", soln_14.Oracle, (16,), soln_14.decrypt_target, check_soln_12),
+    ("soln_16.build_admin_ctxt", soln_16.Oracle, (), soln_16.build_admin_ctxt, check_soln_16),
+]
+
+def run_attack(factory, args: tuple, attack, check, latency: float, jitter: float, remote: bool):
+    """
+    Runs one attack against a metered oracle, in process or behind a local
+    socket, and returns its traffic totals, wall time and whether it worked.
+    """
+    if remote:
+        oracle = RemoteOracle(factory, *args)
+    else:
+        oracle = factory(*args)
+    try:
+        metered = MeteredOracle(oracle, latency, jitter, seed=0)
+        start = time.perf_counter()
+        result = attack(metered)
+        wall = time.perf_counter() - start
+        report = metered.stats.as_dict()
+        report["wall"] = wall
+        report["ok"] = bool(check(oracle, result))
+        return report
+    finally:
+        if remote:
+            oracle.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure oracle traffic of each attack.")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every oracle call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random change to the latency")
+    parser.add_argument("--remote", action="store_true", help="run oracles in a separate process")
+    parser.add_argument("--only", help="only run attacks whose name contains this")
+    args = parser.parse_args()
+
+    print(f"{'attack':<34} {'calls':>7} {'queries':>8} {'bytes in':>10} {'bytes out':>10} {'wall s':>8} {'q/s':>9}  ok")
+    for name, factory, oracle_args, attack, check in ATTACKS:
+        if args.only and args.only not in name:
+            continue
+        r = run_attack(factory, oracle_args, attack, check, args.latency, args.jitter, args.remote)
+        rate = r["queries"] / r["wall"] if r["wall"] else float("inf")
+        print(
+            f"{name:<34} {r['calls']:>7} {r['queries']:>8} {r['bytes_in']:>10} "
+            f"{r['bytes_out']:>10} {r['wall']:>8.3f} {rate:>9.0f}  {r['ok']}"
+        )
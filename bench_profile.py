@@ -0,0 +1,47 @@
+import sys
+import time
+from soln_13 import Oracle, encode_profile, parse_key_value, parse_key_value_bytes
+from tools import pad
+
+def timed(name: str, count: int, func):
+    """Runs func once and prints how many profiles per second it handled."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed:8.2f} s {count / elapsed:12.0f} profiles/s")
+
+def encode_str(email: str, uid: int, blocksize: int):
+    """The previous str-based serialization, kept as a reference point."""
+    email = email.replace("&", "").replace("=", "")
+    return pad(f"email={email}&uid={uid}&role=user".encode('utf-8'), blocksize)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    emails = [f"user{i}@example.com" for i in range(count)]
+    email_bytes = [email.encode() for email in emails]
+    profiles = [encode_str(email, i, 16) for i, email in enumerate(emails)]
+    assert profiles[:1000] == [encode_profile(e, i, 16) for i, e in enumerate(email_bytes[:1000])]
+    stripped = [profile[:-profile[-1]] for profile in profiles]
+    stripped_str = [profile.decode() for profile in stripped]
+
+    timed("encode (str, replace, pad)", count,
+          lambda: [encode_str(e, i, 16) for i, e in enumerate(emails)])
+    timed("encode_profile", count,
+          lambda: [encode_profile(e, i, 16) for i, e in enumerate(email_bytes)])
+    timed("parse_key_value (decode + str)", count,
+          lambda: [parse_key_value(p.decode()) for p in stripped])
+    timed("parse_key_value (str only)", count,
+          lambda: [parse_key_value(p) for p in stripped_str])
+    timed("parse_key_value_bytes", count,
+          lambda: [parse_key_value_bytes(p) for p in stripped])
+
+    # Fuzzing replays a small pool of cut-and-paste ciphertexts many times.
+    uncached = Oracle()
+    cached = Oracle(cache_size=4096)
+    cached.cipher = uncached.cipher
+    pool = [uncached.enc_profile(f"user{i}@example.com") for i in range(1000)]
+    replays = [pool[i % len(pool)] for i in range(count)]
+    timed("dec_parse_profile (no cache)", count,
+          lambda: [uncached.dec_parse_profile(c) for c in replays])
+    timed("dec_parse_profile (cache 4096)", count,
+          lambda: [cached.dec_parse_profile(c) for c in replays])
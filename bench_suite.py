@@ -0,0 +1,195 @@
+import argparse
+import json
+import random
+import sys
+import time
+import soln_4
+import soln_6
+import soln_8
+import soln_10
+import soln_12
+import soln_14
+from bench_xor import label
+from oracle_harness import MeteredOracle
+from soln_5 import xor_repeating_key
+from tools import encode_hex
+
+# Every workload is generated from a seeded random source, so the same
+# size always produces the same data and, for the oracle attacks, the same
+# query count.
+SEED = 1
+
+WORDS = (
+    "the of and to a in is you that it he was for on are as with his they at be "
+    "this have from or one had by word but not what all were we when your can said "
+    "there use an each which she do how their if will up other about out many then "
+    "them these so some her would make like him into time has look two more write "
+    "go see number no way could people my than first water been call who oil its now"
+).split()
+
+def english(rng: random.Random, size: int):
+    """Returns size bytes of text made of common English words."""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.08:
+            word = word.capitalize()
+        if rng.random() < 0.06:
+            word += rng.choice([".", ",", "\n"])
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).encode()[:size]
+
+# Key sizes searched when breaking repeating-key XOR. The bound is the same
+# for every workload, so the attack never learns the key size from the setup.
+MAX_KEYSIZE = 256
+
+def repeating_key_xor(rng: random.Random, size: int):
+    """Breaks repeating-key XOR, with longer keys for longer ciphertexts."""
+    keysize = {10 << 10: 16, 100 << 10: 40, 1 << 20: 100}.get(size, 200)
+    key = rng.randbytes(keysize)
+    ctxt = xor_repeating_key(english(rng, size), key)
+    run = lambda: soln_6.break_repeating_key_xor(ctxt, max_keysize=MAX_KEYSIZE)
+    check = lambda result: result[0] == key
+    return run, check, None
+
+def hex_lines(rng: random.Random, count: int, line_size: int, hidden: bytes):
+    """Returns count random hex lines with one line replaced by hidden, and its index."""
+    lines = [encode_hex(rng.randbytes(line_size)) for _ in range(count)]
+    idx = rng.randrange(count)
+    lines[idx] = encode_hex(hidden)
+    return lines, idx
+
+def single_char_lines(rng: random.Random, count: int):
+    """Finds the one English line XOR'd with a single character among random lines."""
+    key = rng.randrange(256)
+    hidden = bytes(c ^ key for c in english(rng, 30))
+    lines, idx = hex_lines(rng, count, 30, hidden)
+    run = lambda: soln_4.find_ctxt_batch(lines, top_k=5)
+    check = lambda result: result[0][0] == idx and result[0][2] == key
+    return run, check, None
+
+def ecb_lines(rng: random.Random, count: int):
+    """Finds the one ECB line, with repeated blocks, among random lines."""
+    blocks = [rng.randbytes(16) for _ in range(4)]
+    hidden = b"".join(rng.choice(blocks) for _ in range(10))
+    lines, idx = hex_lines(rng, count, 160, hidden)
+    run = lambda: list(soln_8.scan_ecb(lines))
+    check = lambda result: [found[0] for found in result] == [idx]
+    return run, check, None
+
+def cbc_roundtrip(rng: random.Random, size: int):
+    """Encrypts and decrypts a buffer with AES-CBC."""
+    key = rng.randbytes(16)
+    iv = rng.randbytes(16)
+    ptxt = rng.randbytes(size)
+    run = lambda: soln_10.dec_cbc(soln_10.enc_cbc(ptxt, key, iv), key, iv)
+    check = lambda result: result == ptxt
+    return run, check, None
+
+def ecb_suffix(rng: random.Random, size: int):
+    """Decrypts a target of size bytes appended by a soln_12 oracle."""
+    oracle = soln_12.Oracle()
+    oracle.suffix = english(rng, size)
+    metered = MeteredOracle(oracle)
+    run = lambda: soln_12.decrypt_target(metered)
+    check = lambda result: result == oracle.suffix
+    return run, check, metered.stats
+
+def ecb_prefix_suffix(rng: random.Random, size: int):
+    """Decrypts a target of size bytes appended by a soln_14 oracle."""
+    oracle = soln_14.Oracle(16)
+    oracle.prefix = rng.randbytes(rng.randrange(32))
+    oracle.suffix = english(rng, size)
+    metered = MeteredOracle(oracle)
+    run = lambda: soln_14.decrypt_target(metered)
+    check = lambda result: result == oracle.suffix
+    return run, check, metered.stats
+
+# (name, sizes, setup, unit, units per size)
+WORKLOADS = [
+    ("soln_6.break_repeating_key_xor", [10 << 10, 100 << 10, 1 << 20, 10 << 20], repeating_key_xor, "MB", 1 / (1 << 20)),
+    ("soln_4.find_ctxt_batch", [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], single_char_lines, "lines", 1),
+    ("soln_8.scan_ecb", [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], ecb_lines, "lines", 1),
+    ("soln_10.enc_cbc+dec_cbc", [1 << 10, 64 << 10, 1 << 20, 16 << 20], cbc_roundtrip, "MB", 2 / (1 << 20)),
+    ("soln_12.decrypt_target", [100, 1000, 10000], ecb_suffix, "B", 1),
+    ("soln_14.decrypt_target", [100, 1000, 10000], ecb_prefix_suffix, "B", 1),
+]
+
+def run_workload(setup, size: int, units: float, min_time: float = 0.5):
+    """
+    Generates a workload and runs it repeatedly for at least min_time
+    seconds, returning its throughput in units per second from the fastest
+    run, the oracle queries a single run made, and whether every run worked.
+    Taking the fastest run keeps warm-up and noise out of short workloads.
+    """
+    run, check, stats = setup(random.Random(f"{SEED}/{setup.__name__}/{size}"), size)
+    queries = None
+    ok = True
+    best = float("inf")
+    total = 0.0
+    while total < min_time:
+        before = stats.queries if stats else 0
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        if stats and queries is None:
+            queries = stats.queries - before
+        ok = ok and bool(check(result))
+        best = min(best, elapsed)
+        total += elapsed
+    return {
+        "rate": size * units / best,
+        "queries": queries,
+        "ok": ok,
+    }
+
+def regressions(result: dict, baseline: dict, tolerance: float):
+    """Returns the ways a result is worse than its baseline."""
+    flags = []
+    if not result["ok"]:
+        flags.append("FAILED")
+    if baseline is None:
+        return flags
+    if result["rate"] < baseline["rate"] * (1 - tolerance):
+        flags.append(f"SLOWER {result['rate'] / baseline['rate'] - 1:+.0%}")
+    if result["queries"] is not None and baseline["queries"] is not None and result["queries"] > baseline["queries"]:
+        flags.append(f"QUERIES +{result['queries'] - baseline['queries']}")
+    return flags
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every attack on synthetic workloads.")
+    parser.add_argument("--scale", type=int, default=2, help="run the first SCALE sizes of each workload")
+    parser.add_argument("--only", help="only run workloads whose name contains this")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional slowdown")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to repeat each workload for")
+    parser.add_argument("--save", help="write the results as JSON, for use as a baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    failed = False
+    print(f"{'workload':<32} {'size':>6} {'rate':>12} {'unit':<7} {'queries':>9}  flags")
+    for name, sizes, setup, unit, units in WORKLOADS:
+        if args.only and args.only not in name:
+            continue
+        for size in sizes[:args.scale]:
+            key = f"{name}/{label(size)}"
+            result = run_workload(setup, size, units, args.min_time)
+            results[key] = result
+            flags = regressions(result, baseline.get(key), args.tolerance)
+            failed = failed or bool(flags)
+            queries = result["queries"] if result["queries"] is not None else "-"
+            print(f"{name:<32} {label(size):>6} {result['rate']:12.2f} {unit + '/s':<7} {queries:>9}  {' '.join(flags)}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"seed": SEED, "results": results}, f, indent=2)
+            f.write("\n")
+    sys.exit(1 if failed else 0)
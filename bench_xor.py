@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+from tools import xor_buffers, xor_into
+
+SIZES = [
+    1 << 10,
+    10 << 10,
+    100 << 10,
+    1 << 20,
+    10 << 20,
+    100 << 20,
+]
+
+def xor_bytewise(a: bytes, b: bytes):
+    """The original per-byte implementation, kept as a reference point."""
+    return bytes([a[i] ^ b[i] for i in range(len(a))])
+
+def throughput(func, size: int, min_time: float = 0.2):
+    """
+    Calls func repeatedly for at least min_time seconds and returns
+    the achieved throughput in MB/s.
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls * size / elapsed / (1 << 20)
+
+def label(size: int):
+    """
+    Formats a size as MB or KB when it is a whole number of them, and as a
+    plain count otherwise.
+    """
+    for suffix, shift in (("MB", 20), ("KB", 10)):
+        if size >= 1 << shift and size % (1 << shift) == 0:
+            return f"{size >> shift} {suffix}"
+    return str(size)
+
+if __name__ == "__main__":
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    print(f"{'size':>8} {'bytewise':>12} {'xor_buffers':>12} {'xor_into':>12}  (MB/s)")
+    for size in SIZES:
+        if size > max_size:
+            break
+        a = os.urandom(size)
+        b = os.urandom(size)
+        out = bytearray(size)
+        xor_into(out, a, b)
+        assert out == xor_buffers(a, b)
+
+        # The reference implementation is only timed where it finishes quickly.
+        if size <= 1 << 20:
+            bytewise = f"{throughput(lambda: xor_bytewise(a, b), size):12.1f}"
+        else:
+            bytewise = f"{'-':>12}"
+        bulk = throughput(lambda: xor_buffers(a, b), size)
+        into = throughput(lambda: xor_into(out, a, b), size)
+        print(f"{label(size):>8} {bytewise} {bulk:12.1f} {into:12.1f}")
@@ -0,0 +1,35 @@
+from collections import OrderedDict
+from Crypto.Cipher import AES
+
+class CipherFactory:
+    """
+    Hands out AES-ECB objects. They are stateless, so the ones for the
+    maxsize most recently used keys are kept and shared, and repeated use
+    of a key skips key expansion. Only ECB is pooled: pycryptodome's CBC
+    and CTR objects carry chaining state and expand their own key, so they
+    are made with AES.new wherever they are needed.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.ecb_ciphers = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ecb(self, key: bytes):
+        """Returns the shared AES-ECB object for a key."""
+        key = bytes(key)
+        cipher = self.ecb_ciphers.get(key)
+        if cipher is not None:
+            self.hits += 1
+            self.ecb_ciphers.move_to_end(key)
+            return cipher
+
+        self.misses += 1
+        cipher = AES.new(key, AES.MODE_ECB)
+        self.ecb_ciphers[key] = cipher
+        if len(self.ecb_ciphers) > self.maxsize:
+            self.ecb_ciphers.popitem(last=False)
+        return cipher
+
+factory = CipherFactory()
+ecb = factory.ecb
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+class Codebook:
+    """
+    Remembers which ciphertext block each plaintext block encrypts to under
+    one ECB key, and the reverse. Past maxsize entries, the least recently
+    used pair is evicted. Counts hits and misses of every lookup.
+    """
+    def __init__(self, blocksize: int = 16, maxsize: int = 1 << 16):
+        self.blocksize = blocksize
+        self.maxsize = maxsize
+        self.enc_blocks = OrderedDict()
+        self.dec_blocks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.enc_blocks)
+
+    def encrypt_block(self, ptxt_block: bytes):
+        """Returns the ciphertext of a plaintext block, or None if unknown."""
+        ctxt_block = self.enc_blocks.get(ptxt_block)
+        if ctxt_block is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.enc_blocks.move_to_end(ptxt_block)
+        return ctxt_block
+
+    def decrypt_block(self, ctxt_block: bytes):
+        """Returns the plaintext of a ciphertext block, or None if unknown."""
+        ptxt_block = self.dec_blocks.get(ctxt_block)
+        if ptxt_block is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.enc_blocks.move_to_end(ptxt_block)
+        return ptxt_block
+
+    def add(self, ptxt_block: bytes, ctxt_block: bytes):
+        """Records a plaintext block and its ciphertext."""
+        ptxt_block = bytes(ptxt_block)
+        ctxt_block = bytes(ctxt_block)
+        if ptxt_block in self.enc_blocks:
+            self.enc_blocks.move_to_end(ptxt_block)
+            return
+        self.enc_blocks[ptxt_block] = ctxt_block
+        self.dec_blocks[ctxt_block] = ptxt_block
+        while len(self.enc_blocks) > self.maxsize:
+            _, evicted = self.enc_blocks.popitem(last=False)
+            del self.dec_blocks[evicted]
+
+    def learn(self, known_ptxt: bytes, ctxt: bytes, start: int = 0):
+        """
+        Records every whole block of a ciphertext whose plaintext is known.
+        known_ptxt is the plaintext from byte start of the ciphertext onwards.
+        """
+        bs = self.blocksize
+        first = -(-start // bs) * bs
+        end = min(start + len(known_ptxt), len(ctxt))
+        for i in range(first, end - bs + 1, bs):
+            self.add(known_ptxt[i - start: i - start + bs], ctxt[i: i + bs])
+
+    def dictionary(self, known: bytes, encrypt_blocks):
+        """
+        Returns a dictionary from the ciphertext of known + c to c for every
+        byte c, where known is one byte short of a block. Only blocks missing
+        from the codebook are encrypted, all at once by encrypt_blocks, which
+        takes the blocks joined together and returns their ciphertext.
+        """
+        bs = self.blocksize
+        bdict = {}
+        missing = []
+        for c in range(256):
+            ctxt_block = self.encrypt_block(known + bytes([c]))
+            if ctxt_block is None:
+                missing.append(c)
+            else:
+                bdict[ctxt_block] = c
+
+        if missing:
+            ctxt = encrypt_blocks(b"".join(known + bytes([c]) for c in missing))
+            for j, c in enumerate(missing):
+                ctxt_block = ctxt[j * bs: (j + 1) * bs]
+                self.add(known + bytes([c]), ctxt_block)
+                bdict[ctxt_block] = c
+        return bdict
+
+    def stats(self):
+        """Returns the entry count and the lookup hits and misses."""
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+codebooks = WeakKeyDictionary()
+
+def codebook_for(oracle, blocksize: int = 16, maxsize: int = 1 << 16):
+    """
+    Returns the codebook for an oracle's key, shared by every attack on that
+    oracle, creating it on first use.
+    """
+    codebook = codebooks.get(oracle)
+    if codebook is None:
+        codebook = Codebook(blocksize, maxsize)
+        codebooks[oracle] = codebook
+    return codebook
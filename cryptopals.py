@@ -0,0 +1,125 @@
+import argparse
+import os
+import runpy
+import sys
+
+# The solutions live next to this file, one module per challenge.
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def challenges():
+    """Returns the numbers of the challenges with a solution, in order."""
+    numbers = []
+    for name in os.listdir(HERE):
+        if name.startswith("soln_") and name.endswith(".py") and name[5:-3].isdigit():
+            numbers.append(int(name[5:-3]))
+    return sorted(numbers)
+
+# Written to stderr before a profiled solution starts, separating the
+# imports of the interpreter and this script from those of the solution.
+START_MARKER = "cryptopals: start"
+
+def run(number: int, input_path: str = None, mark_start: bool = False, report_path: str = None):
+    """
+    Runs a solution as if it were the main script, importing nothing but
+    the solution and what it imports itself, from the directory holding the
+    solutions. The input path, if given, replaces the solution's default
+    data file. If a report path is given, the solution's stages are
+    instrumented and their totals written there as JSON.
+    """
+    name = f"soln_{number}"
+    if number not in challenges():
+        raise SystemExit(f"No solution for challenge {number}")
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    # Default data files are relative to the solutions, so run from there.
+    args = [os.path.abspath(input_path)] if input_path else []
+    if report_path:
+        report_path = os.path.abspath(report_path)
+    os.chdir(HERE)
+    sys.argv = [os.path.join(HERE, name + ".py")] + args
+    if mark_start:
+        print(START_MARKER, file=sys.stderr, flush=True)
+    if not report_path:
+        runpy.run_module(name, run_name="__main__", alter_sys=True)
+        return
+
+    import instrument
+
+    instrument.enable()
+    try:
+        runpy.run_module(name, run_name="__main__", alter_sys=True)
+    finally:
+        instrument.write_report(report_path)
+
+def parse_importtime(lines):
+    """
+    Parses the output of -X importtime into (self us, cumulative us, depth,
+    module) tuples in the order the imports finished.
+    """
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        imports.append((int(self_us), int(cumulative_us), depth, module.strip()))
+    return imports
+
+def profile_imports(number: int, input_path: str = None, top: int = 15):
+    """
+    Runs a solution in a fresh interpreter with -X importtime and prints its
+    output, then a summary to stderr: the time spent on imports before the
+    solution starts, the time spent on the solution's own imports, and its
+    slowest imports by cumulative time.
+    """
+    import subprocess
+
+    command = [sys.executable, "-X", "importtime", os.path.abspath(__file__),
+               "run", str(number), "--mark-start"]
+    if input_path:
+        command += ["--input", input_path]
+    result = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+
+    lines = result.stderr.splitlines()
+    split = lines.index(START_MARKER) if START_MARKER in lines else len(lines)
+    errors = [line for line in lines[split + 1:] if not line.startswith("import time:")]
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+
+    startup = parse_importtime(lines[:split])
+    imports = parse_importtime(lines[split + 1:])
+    def total(entries):
+        return sum(cumulative for _, cumulative, depth, _ in entries if depth == 0) / 1000
+
+    print(f"\nstartup imports: {len(startup)} modules, {total(startup):.1f} ms", file=sys.stderr)
+    print(f"soln_{number} imports: {len(imports)} modules, {total(imports):.1f} ms", file=sys.stderr)
+    print(f"{'self ms':>8} {'cumul ms':>9}  module", file=sys.stderr)
+    for self_us, cumulative, depth, module in sorted(imports, key=lambda i: -i[1])[:top]:
+        print(f"{self_us / 1000:8.1f} {cumulative / 1000:9.1f}  {'  ' * depth}{module}", file=sys.stderr)
+    return result.returncode
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cryptopals", description="Runs challenge solutions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the solution to a challenge")
+    run_parser.add_argument("number", type=int, help="challenge number")
+    run_parser.add_argument("--input", help="data file to use instead of the default")
+    run_parser.add_argument("--profile-imports", action="store_true",
+                            help="run under -X importtime and summarize startup time")
+    run_parser.add_argument("--report", metavar="PATH",
+                            help="write per-stage call counts, bytes and times as JSON")
+    run_parser.add_argument("--top", type=int, default=15, help="slowest imports to show")
+    run_parser.add_argument("--mark-start", action="store_true", help=argparse.SUPPRESS)
+    commands.add_parser("list", help="list the challenges with a solution")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print(" ".join(map(str, challenges())))
+    elif args.profile_imports:
+        return profile_imports(args.number, args.input, args.top)
+    else:
+        run(args.number, args.input, args.mark_start, args.report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import mmap
+import os
+import tempfile
+import zlib
+from tools import iter_base64, iter_hex
+
+def iter_views(buf, chunksize: int = 1 << 20):
+    """Yields memoryviews of consecutive chunks of a buffer of at most chunksize bytes."""
+    view = memoryview(buf)
+    for i in range(0, len(view), chunksize):
+        yield view[i: i + chunksize]
+
+def cache_dir():
+    """
+    Returns the directory for this user's decoded files, under
+    XDG_CACHE_HOME or ~/.cache, creating it readable only by the user.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "cryptopals")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+def cache_path_for(path: str, beside: bool = False, suffix: str = ".bin"):
+    """
+    Returns where the decoded contents of an encoded file are cached: a file
+    named after the source's path, size and modification time, so a changed
+    source is decoded again. It goes in the user's cache directory, or next
+    to the source if beside is True.
+    """
+    info = os.stat(path)
+    source = os.path.abspath(path)
+    tag = f"{zlib.crc32(source.encode()):08x}-{info.st_size}-{info.st_mtime_ns}"
+    name = f"{os.path.basename(path)}.{tag}{suffix}"
+    return os.path.join(os.path.dirname(source) if beside else cache_dir(), name)
+
+def clear_cache():
+    """Deletes every decoded file in the user's cache directory."""
+    directory = cache_dir()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+
+class CiphertextBuffer:
+    """
+    A read-only ciphertext backed by a memory-mapped file. Block, column and
+    stride views are memoryviews into the mapping, so nothing is copied and
+    only the pages in use need to be resident, however large the file. The
+    views are accepted anywhere the tools and attacks take bytes. Use as a
+    context manager, or call close() once every view has been released.
+    """
+    def __init__(self, path: str, delete: bool = False):
+        self.path = path
+        self.delete = delete
+        self.file = open(path, "rb")
+        # Empty files cannot be mapped.
+        if os.fstat(self.file.fileno()).st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+        else:
+            self.map = None
+            self.view = memoryview(b"")
+
+    @classmethod
+    def from_encoded(cls, path: str, decode, keep: bool = False, beside: bool = False,
+                     cache_path: str = None, chunksize: int = 1 << 20):
+        """
+        Maps the decoded contents of an encoded file. decode takes a binary
+        file object and a chunk size and yields decoded chunks, so memory use
+        while decoding does not grow with the size of the file. By default
+        the contents are decoded to a private temporary file that is deleted
+        on close. If keep is True, they are decoded to a cache file that is
+        reused while it is up to date: cache_path if given, otherwise in the
+        user's cache directory, or next to the source if beside is True.
+        """
+        if keep:
+            cache_path = cache_path or cache_path_for(path, beside)
+            if os.path.exists(cache_path):
+                return cls(cache_path)
+            directory = os.path.dirname(cache_path) or "."
+        else:
+            directory = None
+
+        fd, partial = tempfile.mkstemp(suffix=".bin", dir=directory)
+        try:
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                for chunk in decode(src, chunksize):
+                    dst.write(chunk)
+            if keep:
+                os.replace(partial, cache_path)
+        except BaseException:
+            os.remove(partial)
+            raise
+        if keep:
+            return cls(cache_path)
+        return cls(partial, delete=True)
+
+    @classmethod
+    def from_base64(cls, path: str, keep: bool = False, beside: bool = False,
+                    cache_path: str = None, chunksize: int = 1 << 20):
+        """Maps the decoded contents of a base64 file."""
+        return cls.from_encoded(path, iter_base64, keep, beside, cache_path, chunksize)
+
+    @classmethod
+    def from_hex(cls, path: str, keep: bool = False, beside: bool = False,
+                 cache_path: str = None, chunksize: int = 1 << 20):
+        """Maps the decoded contents of a hex file."""
+        return cls.from_encoded(path, iter_hex, keep, beside, cache_path, chunksize)
+
+    def __len__(self):
+        return len(self.view)
+
+    def block(self, i: int, blocksize: int = 16):
+        """Returns a view of block i."""
+        return self.view[i * blocksize: (i + 1) * blocksize]
+
+    def blocks(self, blocksize: int = 16):
+        """Yields a view of every block, the last of which may be short."""
+        for i in range(0, len(self.view), blocksize):
+            yield self.view[i: i + blocksize]
+
+    def column(self, i: int, keysize: int):
+        """Returns a view of every byte at position i of a repeating key."""
+        return self.view[i::keysize]
+
+    def stride(self, start: int, step: int, stop: int = None):
+        """Returns a view of every step-th byte from start up to stop."""
+        return self.view[start:stop:step]
+
+    def chunks(self, chunksize: int = 1 << 20):
+        """Yields views of consecutive chunks of at most chunksize bytes."""
+        return iter_views(self.view, chunksize)
+
+    def close(self):
+        """
+        Unmaps the file, deleting it if it is a temporary file. Raises
+        BufferError if views handed out are still alive; the mapping is
+        then freed once they are gone.
+        """
+        self.view.release()
+        self.file.close()
+        try:
+            if self.map is not None:
+                self.map.close()
+        finally:
+            if self.delete and os.path.exists(self.path):
+                os.remove(self.path)
+                self.delete = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,134 @@
+import functools
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+# json and platform are imported when a report is made, keeping this module
+# cheap to import for the short-lived jobs that never make one.
+
+# Instrumentation is off unless enable() is called or CRYPTOPALS_INSTRUMENT
+# is set. Functions decorated with timed while it is off are left as they
+# are, so they cost nothing, and a stage is a shared no-op context manager.
+enabled = bool(os.environ.get("CRYPTOPALS_INSTRUMENT"))
+
+# Running totals for every stage name: [calls, bytes, seconds].
+totals = {}
+
+def enable():
+    """
+    Starts recording stages. Functions decorated with timed are only
+    recorded if their module is imported after this is called.
+    """
+    global enabled
+    enabled = True
+
+def disable():
+    """Stops recording stages, keeping the totals so far."""
+    global enabled
+    enabled = False
+
+def reset():
+    """Clears the totals of every stage."""
+    totals.clear()
+
+def record(name: str, nbytes: int, seconds: float):
+    """Adds one call of a stage to its totals."""
+    entry = totals.get(name)
+    if entry is None:
+        entry = totals[name] = [0, 0, 0.0]
+    entry[0] += 1
+    entry[1] += nbytes
+    entry[2] += seconds
+
+def buffer_size(value):
+    """Returns the length of a bytes-like or str value, or 0 for anything else."""
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    return 0
+
+class Stage:
+    """Times the block it wraps and records it under a stage name."""
+    def __init__(self, name: str, nbytes: int = 0):
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.nbytes, time.perf_counter() - self.start)
+
+disabled_stage = nullcontext()
+
+def stage(name: str, nbytes: int = 0):
+    """
+    Returns a context manager recording the block it wraps as one call of
+    the named stage processing nbytes bytes, or a no-op when disabled.
+    """
+    if not enabled:
+        return disabled_stage
+    return Stage(name, nbytes)
+
+def timed(name: str = None):
+    """
+    Decorates a function so that each call is recorded as one call of a
+    stage, named after the function's module and name unless given. The
+    bytes processed are the length of the first argument if it is bytes-like.
+    Only calls in the current process are recorded, not those made by
+    workers of a process pool. If instrumentation is off when the function
+    is decorated, the function is returned unwrapped.
+    """
+    def decorator(func):
+        if not enabled:
+            return func
+        stage_name = name
+        if stage_name is None:
+            module = func.__module__
+            if module == "__main__":
+                module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+            stage_name = f"{module}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage_name, buffer_size(args[0]) if args else 0, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def report():
+    """
+    Returns the totals as a dictionary that can be dumped to JSON, with the
+    stages sorted by total time and some details of the run.
+    """
+    import platform
+
+    stages = {}
+    for name, (calls, nbytes, seconds) in sorted(totals.items(), key=lambda item: -item[1][2]):
+        stages[name] = {
+            "calls": calls,
+            "bytes": nbytes,
+            "seconds": seconds,
+            "mb_per_s": nbytes / seconds / 1e6 if seconds and nbytes else None,
+        }
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "argv": sys.argv,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": stages,
+    }
+
+def write_report(path: str):
+    """Writes the report for the run so far to a JSON file."""
+    import json
+
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=2)
+        f.write("\n")
@@ -0,0 +1,202 @@
+import random
+import secrets
+import time
+
+# asyncio and multiprocessing are only imported by the oracles that use them,
+# so that importing MeteredOracle alone stays cheap.
+
+class OracleStats:
+    """Running totals of the traffic between an attack and an oracle."""
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        """Returns the totals as a dictionary."""
+        return dict(vars(self))
+
+def payload_size(value):
+    """Counts the bytes in an oracle argument or result."""
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    return 0
+
+class MeteredOracle:
+    """
+    Wraps an oracle and counts the calls, queries, and bytes in and out of
+    every method called on it, along with the time spent inside them. Each
+    call can be delayed by a simulated latency, plus or minus a uniformly
+    random jitter. A batched call such as enc_many counts as one call but
+    one query per plaintext. Attributes that are not methods pass through.
+    """
+    def __init__(self, oracle, latency: float = 0.0, jitter: float = 0.0, seed: int = None):
+        self.oracle = oracle
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.stats = OracleStats()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.oracle, name)
+        if not callable(attr):
+            return attr
+
+        def metered(*args):
+            start = time.perf_counter()
+            self.wait()
+            result = attr(*args)
+            self.stats.seconds += time.perf_counter() - start
+            self.stats.calls += 1
+            self.stats.queries += len(args[0]) if args and isinstance(args[0], list) else 1
+            self.stats.bytes_in += payload_size(args)
+            self.stats.bytes_out += payload_size(result)
+            return result
+        return metered
+
+    def wait(self):
+        """Sleeps for one call's simulated latency."""
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+def run_oracle_server(address, authkey: bytes, factory, args: tuple):
+    """
+    Creates an oracle, connects back to the harness at the given address,
+    and answers method calls on the oracle until it receives None.
+    """
+    from multiprocessing.connection import Client
+
+    oracle = factory(*args)
+    with Client(address, authkey=authkey) as conn:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            name, call_args = request
+            try:
+                conn.send((True, getattr(oracle, name)(*call_args)))
+            except Exception as e:
+                conn.send((False, e))
+
+class RemoteOracle:
+    """
+    Runs an oracle created by factory(*args) in a separate process and
+    forwards method calls to it over a local connection, as a stand-in for an
+    oracle behind a network service. Only methods can be called remotely.
+    Use as a context manager, or call close() to stop the server.
+    """
+    def __init__(self, factory, *args):
+        import multiprocessing
+        from multiprocessing.connection import Listener
+
+        authkey = secrets.token_bytes(16)
+        # With no address, the listener uses the platform's default local
+        # transport, a Unix socket or a named pipe, which avoids the delayed
+        # ACK stalls that TCP loopback adds to large messages.
+        with Listener(authkey=authkey) as listener:
+            self.process = multiprocessing.Process(
+                target=run_oracle_server,
+                args=(listener.address, authkey, factory, args),
+                daemon=True,
+            )
+            self.process.start()
+            self.conn = listener.accept()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def remote(*args):
+            self.conn.send((name, args))
+            ok, result = self.conn.recv()
+            if not ok:
+                raise result
+            return result
+        return remote
+
+    def close(self):
+        """Stops the oracle process."""
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class AsyncOracle:
+    """
+    Exposes every method of a synchronous oracle as a coroutine that first
+    waits for a simulated round trip, so many calls can be in flight at once.
+    A fraction of calls can be made to fail with ConnectionError after their
+    round trip, to exercise retries.
+    """
+    def __init__(self, oracle, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = None):
+        self.oracle = oracle
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.stats = OracleStats()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.oracle, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args):
+            import asyncio
+
+            delay = self.latency
+            if self.jitter:
+                delay += self.random.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(max(delay, 0))
+            self.stats.calls += 1
+            if self.random.random() < self.failure_rate:
+                raise ConnectionError(f"Simulated failure of {name}")
+            return attr(*args)
+        return call
+
+class ThrottledOracle:
+    """
+    Wraps an async oracle so that at most concurrency calls are in flight at
+    once. Calls failing with a connection error or timeout are retried up to
+    retries times, waiting backoff seconds before the first retry and twice
+    as long before each one after that.
+    """
+    def __init__(self, oracle, concurrency: int = 32, retries: int = 3, backoff: float = 0.05):
+        import asyncio
+
+        self.oracle = oracle
+        self.limit = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.backoff = backoff
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.oracle, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args):
+            import asyncio
+
+            for attempt in range(self.retries + 1):
+                async with self.limit:
+                    try:
+                        return await attr(*args)
+                    except (ConnectionError, TimeoutError):
+                        if attempt == self.retries:
+                            raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        return call
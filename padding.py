@@ -0,0 +1,58 @@
+# hmac is imported when padding is first checked, since it loads hashlib
+# and would otherwise slow the startup of every solution importing tools.
+
+# The PKCS#7 padding string for every possible length.
+PADDING = [bytes([n] * n) for n in range(256)]
+
+def pad(msg: bytes, blocksize: int):
+    """Returns a message with PKCS#7 padding appended for a given block size."""
+    return msg + PADDING[blocksize - len(msg) % blocksize]
+
+def pad_into(buf: bytearray, blocksize: int):
+    """
+    Appends PKCS#7 padding for a given block size to a bytearray in place.
+    Returns the number of bytes added.
+    """
+    amount = blocksize - len(buf) % blocksize
+    buf += PADDING[amount]
+    return amount
+
+def padding_length(msg: bytes, blocksize: int):
+    """
+    Returns the length of the PKCS#7 padding on a message, or 0 if the padding
+    is invalid. The whole last block is always compared in one constant-time
+    step, whatever the padding byte is.
+    """
+    from hmac import compare_digest
+
+    if not msg or len(msg) % blocksize != 0:
+        return 0
+    amount = msg[-1]
+    valid = 0 < amount <= blocksize
+    checked = amount if valid else blocksize
+    last_block = bytes(msg[-blocksize:])
+    expected = last_block[:blocksize - checked] + PADDING[checked]
+    if compare_digest(last_block, expected) and valid:
+        return amount
+    return 0
+
+def unpad(msg: bytes, blocksize: int):
+    """
+    Validates and strips the PKCS#7 padding from a message, returning a
+    memoryview of the unpadded message without copying it.
+    """
+    amount = padding_length(msg, blocksize)
+    if not amount:
+        raise ValueError("Invalid padding")
+    return memoryview(msg)[:len(msg) - amount]
+
+def validate_blocks(blocks: bytes, blocksize: int):
+    """
+    Checks the PKCS#7 padding of many final blocks laid out back to back in
+    one buffer, returning a list with one bool per block.
+    """
+    results = []
+    for end in range(blocksize, len(blocks) + 1, blocksize):
+        amount = blocks[end - 1]
+        results.append(0 < amount <= blocksize and blocks.endswith(PADDING[amount], end - blocksize, end))
+    return results
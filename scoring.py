@@ -0,0 +1,233 @@
+import math
+import string
+import sys
+from itertools import repeat
+
+# Approximate frequencies of characters in English prose, spaces and
+# punctuation included. Letters are case-folded here and split between
+# cases when the tables are built.
+char_freq = {
+    ' ': 0.1700, '.': 0.0090, ',': 0.0090, "'": 0.0030, '"': 0.0020,
+    '\n': 0.0030, '-': 0.0015, '?': 0.0005, '!': 0.0005, ';': 0.0003,
+    ':': 0.0003, '(': 0.0002, ')': 0.0002,
+    'e': 0.1030, 't': 0.0765, 'a': 0.0663, 'o': 0.0630, 'i': 0.0624,
+    'n': 0.0596, 's': 0.0537, 'r': 0.0518, 'h': 0.0416, 'l': 0.0336,
+    'd': 0.0315, 'c': 0.0275, 'u': 0.0225, 'm': 0.0207, 'f': 0.0198,
+    'p': 0.0176, 'g': 0.0154, 'w': 0.0139, 'y': 0.0137, 'b': 0.0122,
+    'v': 0.0087, 'k': 0.0045, 'x': 0.0019, 'j': 0.0013, 'q': 0.0010,
+    'z': 0.0007,
+}
+# Share of letters that are uppercase, and probabilities for every other
+# printable byte and for unprintable bytes.
+uppercase_share = 0.03
+digit_freq = 0.0005
+printable_freq = 0.00005
+unprintable_freq = 1e-8
+
+# The most common letter bigrams and trigrams in English as percentages of
+# all letter bigrams and trigrams, from Norvig's counts over Google Books.
+bigram_freq = {
+    'th': 3.56, 'he': 3.07, 'in': 2.43, 'er': 2.05, 'an': 1.99, 're': 1.85,
+    'on': 1.76, 'at': 1.49, 'en': 1.45, 'nd': 1.35, 'ti': 1.34, 'es': 1.34,
+    'or': 1.28, 'te': 1.20, 'of': 1.17, 'ed': 1.17, 'is': 1.13, 'it': 1.12,
+    'al': 1.09, 'ar': 1.07, 'st': 1.05, 'to': 1.04, 'nt': 1.04, 'ng': 0.95,
+    'se': 0.93, 'ha': 0.93, 'as': 0.87, 'ou': 0.87, 'io': 0.83, 'le': 0.83,
+    've': 0.83, 'co': 0.79, 'me': 0.79, 'de': 0.76, 'hi': 0.76, 'ri': 0.73,
+    'ro': 0.73, 'ic': 0.70, 'ne': 0.69, 'ea': 0.69, 'ra': 0.69, 'ce': 0.65,
+    'li': 0.62, 'ch': 0.60, 'll': 0.58, 'be': 0.58, 'ma': 0.57, 'si': 0.55,
+    'om': 0.55, 'ur': 0.54,
+}
+trigram_freq = {
+    'the': 1.81, 'and': 0.73, 'ing': 0.72, 'ent': 0.42, 'ion': 0.42,
+    'her': 0.36, 'for': 0.34, 'tha': 0.33, 'nth': 0.33, 'int': 0.32,
+    'ere': 0.31, 'tio': 0.31, 'ter': 0.30, 'est': 0.28, 'ers': 0.28,
+    'ati': 0.26, 'hat': 0.26, 'ate': 0.25, 'all': 0.25, 'eth': 0.24,
+    'hes': 0.24, 'ver': 0.24, 'his': 0.24, 'oft': 0.22, 'ith': 0.21,
+    'fth': 0.21, 'sth': 0.21, 'oth': 0.21, 'res': 0.21, 'ont': 0.20,
+}
+
+def cased(text: str):
+    """Returns every combination of upper and lower case of a string as bytes."""
+    variants = [b""]
+    for char in text:
+        variants = [v + bytes([ord(c)]) for v in variants for c in {char, char.upper()}]
+    return variants
+
+def build_unigram_table():
+    """Returns the log-probability of every byte value."""
+    table = [math.log(unprintable_freq)] * 256
+    for char in string.printable:
+        table[ord(char)] = math.log(printable_freq)
+    for char in string.digits:
+        table[ord(char)] = math.log(digit_freq)
+    for char, freq in char_freq.items():
+        if char.isalpha():
+            table[ord(char)] = math.log(freq * (1 - uppercase_share))
+            table[ord(char.upper())] = math.log(freq * uppercase_share)
+        else:
+            table[ord(char)] = math.log(freq)
+    return table
+
+def build_bigram_table():
+    """
+    Returns the correction from independent unigrams to bigrams for every
+    byte pair, log P(ab) - log P(a) - log P(b) over letters, indexed by the
+    pair read as a native 16-bit integer. Letter pairs missing from
+    bigram_freq back off to sharing the remaining bigram probability in
+    proportion to their unigram probabilities. Pairs with a non-letter
+    byte are left at 0, scoring as independent bytes.
+    """
+    letter_total = sum(freq for char, freq in char_freq.items() if char.isalpha())
+    letters = {char: freq / letter_total for char, freq in char_freq.items() if char.isalpha()}
+    known = sum(bigram_freq.values()) / 100
+    unknown_mass = 1 - sum(letters[a] * letters[b] for a, b in bigram_freq)
+    backoff = math.log((1 - known) / unknown_mass)
+
+    table = [0.0] * (1 << 16)
+    for a in letters:
+        for b in letters:
+            pair = a + b
+            if pair in bigram_freq:
+                correction = math.log(bigram_freq[pair] / 100 / (letters[a] * letters[b]))
+            else:
+                correction = backoff
+            for variant in cased(pair):
+                table[int.from_bytes(variant, sys.byteorder)] = correction
+    return table, letters
+
+unigram_table = build_unigram_table()
+bigram_table, letter_freq = build_bigram_table()
+
+def build_trigram_table():
+    """
+    Returns the correction from bigrams to trigrams for the trigrams in
+    trigram_freq, keyed by the trigram's bytes. Other trigrams are left out
+    and score as their two bigrams.
+    """
+    table = {}
+    for trigram, freq in trigram_freq.items():
+        a, b, c = trigram
+        bigram_estimate = (
+            math.log(letter_freq[a] * letter_freq[b] * letter_freq[c])
+            + bigram_table[int.from_bytes((a + b).encode(), sys.byteorder)]
+            + bigram_table[int.from_bytes((b + c).encode(), sys.byteorder)]
+        )
+        correction = math.log(freq / 100) - bigram_estimate
+        for variant in cased(trigram):
+            table[variant] = correction
+    return table
+
+trigram_table = build_trigram_table()
+
+# Byte values counted as unprintable, to delete with bytes.translate.
+unprintable = bytes(c for c in range(256) if chr(c) not in string.printable)
+
+class ScoreState:
+    """
+    The score of a buffer that is edited one byte at a time. Changing a byte
+    only rescores the n-grams that cover it, so each update costs the same
+    whatever the length of the buffer.
+    """
+    def __init__(self, scorer, buf: bytes):
+        self.scorer = scorer
+        self.buf = bytearray(buf)
+        self.total = scorer.log_prob(self.buf)
+
+    def around(self, i: int):
+        """Returns the log-probability of the n-grams covering byte i."""
+        scorer = self.scorer
+        buf = self.buf
+        total = unigram_table[buf[i]]
+        if scorer.bigrams:
+            for start in range(max(i - 1, 0), min(i + 1, len(buf) - 1)):
+                total += bigram_table[int.from_bytes(buf[start: start + 2], sys.byteorder)]
+        if scorer.trigrams:
+            for start in range(max(i - 2, 0), min(i + 1, len(buf) - 2)):
+                total += trigram_table.get(bytes(buf[start: start + 3]), 0.0)
+        return total
+
+    def update(self, i: int, value: int):
+        """Sets byte i to value and returns the new score."""
+        self.total -= self.around(i)
+        self.buf[i] = value
+        self.total += self.around(i)
+        return self.score
+
+    @property
+    def score(self):
+        """The score of the buffer as it stands, as given by NgramScorer.score."""
+        return -self.total / len(self.buf) if self.buf else float('inf')
+
+class NgramScorer:
+    """
+    Scores how much byte strings look like English text with a byte unigram
+    model, corrected by letter bigrams and optionally trigrams. A score is
+    the negative mean log-probability per byte, so lower is better, as with
+    the Bhattacharyya distance in soln_3. Each n-gram order is one pass of
+    table lookups over the whole buffer.
+    """
+    def __init__(self, bigrams: bool = True, trigrams: bool = False):
+        self.bigrams = bigrams
+        self.trigrams = trigrams
+
+    def log_prob(self, buf: bytes):
+        """Returns the total log-probability of a buffer."""
+        total = sum(map(unigram_table.__getitem__, buf))
+        if self.bigrams and len(buf) > 1:
+            # Reading the buffer as 16-bit integers from offsets 0 and 1
+            # covers every adjacent pair, each as its bigram table index.
+            view = memoryview(buf)
+            if not view.c_contiguous:
+                # Strided views, such as the columns of a CiphertextBuffer,
+                # cannot be cast, so they are copied first.
+                view = memoryview(view.tobytes())
+            even = view[:len(buf) & ~1].cast('H')
+            odd = view[1:1 + ((len(buf) - 1) & ~1)].cast('H')
+            total += sum(map(bigram_table.__getitem__, even))
+            total += sum(map(bigram_table.__getitem__, odd))
+        if self.trigrams and len(buf) > 2:
+            buf = bytes(buf)
+            trigrams = map(buf.__getitem__, map(slice, range(len(buf) - 2), range(3, len(buf) + 1)))
+            total += sum(map(trigram_table.get, trigrams, repeat(0.0)))
+        return total
+
+    def score(self, buf: bytes):
+        """Returns the score of a buffer."""
+        if not buf:
+            return float('inf')
+        return -self.log_prob(buf) / len(buf)
+
+    def state(self, buf: bytes):
+        """Returns a ScoreState for incremental scoring of a buffer."""
+        return ScoreState(self, buf)
+
+    def score_many(self, bufs, width: int = None):
+        """
+        Scores many candidates, given either as a list of buffers or as one
+        buffer holding rows of width bytes back to back, and returns a list
+        of scores in order. Rows are scored as views into the buffer.
+        """
+        if width is None:
+            return [self.score(buf) for buf in bufs]
+        view = memoryview(bufs)
+        return [self.score(view[i: i + width]) for i in range(0, len(view), width)]
+
+    def key_scores(self, ctxt: bytes):
+        """
+        Returns the (score, unprintable) pair of a ciphertext XOR'd with
+        every single-character key, where unprintable is the fraction of
+        unprintable bytes. Candidates are made by translating the ciphertext
+        through each key's XOR table and scored in one batch.
+        """
+        if not ctxt:
+            return [(float('inf'), 0)] * 256
+        ctxt = bytes(ctxt)
+        candidates = [ctxt.translate(xor_tables[key]) for key in range(256)]
+        scores = self.score_many(b"".join(candidates), len(ctxt))
+        return [
+            (score, (len(ptxt) - len(ptxt.translate(None, unprintable))) / len(ptxt))
+            for score, ptxt in zip(scores, candidates)
+        ]
+
+# Translation tables XORing every byte with each single-character key.
+xor_tables = [bytes(c ^ key for c in range(256)) for key in range(256)]
@@ -1,47 +1,65 @@
-from tools import decode_base64, xor_buffers
-from Crypto.Cipher import AES
+import sys
+import ciphers
+from tools import xor_into
+from instrument import timed
 
+@timed()
 def enc_cbc(ptxt: bytes, key: bytes, iv: bytes):
     """Encrypts a given plaintext under AES-CBC, given a key and IV."""
-    if len(ptxt) % len(key) != 0:
+    # Blocks are the AES block size whatever the key size, so 24 and 32
+    # byte keys are chained in 16 byte blocks like 16 byte keys.
+    cipher = ciphers.ecb(key)
+    blocksize = cipher.block_size
+    if len(ptxt) % blocksize != 0:
         raise ValueError("Padding")
     
-    if len(iv) != len(key):
+    if len(iv) != blocksize:
         raise ValueError("Incorrect sized initialization vector")
 
-    cipher = AES.new(key, AES.MODE_ECB)
-    ctxt = bytearray()
-    last_ctxt = iv
+    # The chaining value is kept as an integer so each block costs one
+    # XOR, and ciphertext blocks are written into a preallocated buffer.
+    encrypt = cipher.encrypt
+    ctxt = bytearray(len(ptxt))
+    ptxt_view = memoryview(ptxt)
+    last_ctxt = int.from_bytes(iv, "little")
 
-    blocksize = len(key)
     for i in range(0, len(ptxt), blocksize):
-        block = xor_buffers(last_ctxt, ptxt[i: i + blocksize])
-        last_ctxt = cipher.encrypt(block)
-        ctxt += last_ctxt
-    
+        block = int.from_bytes(ptxt_view[i: i + blocksize], "little") ^ last_ctxt
+        ctxt_block = encrypt(block.to_bytes(blocksize, "little"))
+        ctxt[i: i + blocksize] = ctxt_block
+        last_ctxt = int.from_bytes(ctxt_block, "little")
+
     return bytes(ctxt)
 
+@timed()
 def dec_cbc(ctxt: bytes, key: bytes, iv: bytes):
     """Decrypts a given plaintext under AES-CBC, given a key and IV."""
-    if len(ctxt) % len(key) != 0:
+    cipher = ciphers.ecb(key)
+    blocksize = cipher.block_size
+    if len(ctxt) % blocksize != 0:
         raise ValueError("Padding")
     
-    if len(iv) != len(key):
+    if len(iv) != blocksize:
         raise ValueError("Incorrect sized initialization vector")
 
-    cipher = AES.new(key, AES.MODE_ECB)
-    ptxt = bytearray()
-    last_ctxt = iv
-    for i in range(0, len(ctxt), len(key)):
-        last_ctxt_block = ctxt[i: i + len(key)]
-        ptxt += xor_buffers(cipher.decrypt(last_ctxt_block), last_ctxt)
-        last_ctxt = last_ctxt_block
+    # Each plaintext block only depends on two ciphertext blocks, so the
+    # whole buffer is decrypted at once and XOR'd against the ciphertext
+    # shifted back by one block.
+    decrypted = memoryview(cipher.decrypt(ctxt))
+    ctxt_view = memoryview(ctxt)
+    ptxt = bytearray(len(ctxt))
+    ptxt_view = memoryview(ptxt)
+
+    if ctxt:
+        xor_into(ptxt_view, decrypted[:blocksize], iv)
+        xor_into(ptxt_view[blocksize:], decrypted[blocksize:], ctxt_view[:-blocksize])
     return bytes(ptxt)
 
 if __name__ == "__main__":
-    with open("data/10.txt", "r") as f:
-        ctxt = decode_base64(f.read())
-    
-        ptxt = dec_cbc(ctxt, b"YELLOW SUBMARINE", bytes([0] * 16))
-        assert(ctxt == enc_cbc(ptxt, b"YELLOW SUBMARINE", bytes([0] * 16)))
+    from ctxt_buffer import CiphertextBuffer
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/10.txt"
+    with CiphertextBuffer.from_base64(path) as ctxt:
+        ptxt = dec_cbc(ctxt.view, b"YELLOW SUBMARINE", bytes([0] * 16))
+        assert(ctxt.view == enc_cbc(ptxt, b"YELLOW SUBMARINE", bytes([0] * 16)))
         print(ptxt)
\ No newline at end of file
@@ -23,6 +23,57 @@ def enc_random(ptxt: bytes, keysize: bytes = 16):
     else:
         return "cbc", enc_cbc(ptxt, key, secrets.token_bytes(keysize))
 
+def guaranteed_repeats(ptxt_len: int, blocksize: int = 16, min_pad: int = 5, max_pad: int = 10):
+    """
+    Returns how many repeated ciphertext blocks ECB is certain to produce when
+    a plaintext of ptxt_len identical bytes goes through enc_random, whatever
+    the length of the random prefix between min_pad and max_pad bytes.
+    """
+    repeats = []
+    for head in range(min_pad, max_pad + 1):
+        first = -(-head // blocksize)
+        last = (head + ptxt_len) // blocksize
+        repeats.append(max(last - first - 1, 0))
+    return min(repeats)
+
+def classify_modes(ctxts, offsets: list = None, blocksize: int = 16, expected: int = 0):
+    """
+    Guesses the mode of many ciphertexts at once by counting repeated blocks
+    in each, returning a list of (mode, confidence) pairs in input order.
+    Ciphertexts are either a list, or one contiguous buffer with a list of
+    offsets marking where each ciphertext starts plus the end of the last.
+    expected is the number of repeats ECB is certain to produce, as given by
+    guaranteed_repeats. A ciphertext with repeats is ECB, with confidence
+    growing to 1 as the repeats reach expected. One without is CBC with
+    confidence 1 if repeats were expected, and 0.5 if there was nothing to find.
+    """
+    if offsets is None:
+        offsets = [0]
+        for ctxt in ctxts:
+            offsets.append(offsets[-1] + len(ctxt))
+        ctxts = b"".join(ctxts)
+    buf = bytes(ctxts)
+
+    # Cut the buffer into blocks once, so each ciphertext is a slice of the
+    # block list and its repeats are counted by hashing its blocks into a set.
+    aligned = all(offset % blocksize == 0 for offset in offsets)
+    if aligned:
+        blocks = [buf[i: i + blocksize] for i in range(0, len(buf), blocksize)]
+
+    cbc_confidence = 1.0 if expected else 0.5
+    verdicts = []
+    for start, end in zip(offsets, offsets[1:]):
+        if aligned:
+            ctxt_blocks = blocks[start // blocksize: -(-end // blocksize)]
+        else:
+            ctxt_blocks = [buf[i: min(i + blocksize, end)] for i in range(start, end, blocksize)]
+        repeats = len(ctxt_blocks) - len(set(ctxt_blocks))
+        if repeats:
+            verdicts.append(("ecb", min(repeats / expected, 1.0) if expected else 1.0))
+        else:
+            verdicts.append(("cbc", cbc_confidence))
+    return verdicts
+
 if __name__ == "__main__":
     blocksize = 16
     ptxt = bytes(blocksize * 3)
@@ -33,4 +84,11 @@ if __name__ == "__main__":
         else:
             assert(method == "cbc")
     
-    print("Detected correctly x100")
\ No newline at end of file
+    print("Detected correctly x100")
+
+    expected = guaranteed_repeats(len(ptxt), blocksize)
+    samples = [enc_random(ptxt) for _ in range(10000)]
+    verdicts = classify_modes([ctxt for _, ctxt in samples], expected=expected)
+    assert([mode for mode, _ in verdicts] == [method for method, _ in samples])
+    assert(all(confidence == 1.0 for _, confidence in verdicts))
+    print(f"Batch detected correctly x{len(samples)}")
\ No newline at end of file
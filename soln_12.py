@@ -1,7 +1,15 @@
 from Crypto.Cipher import AES
 from secrets import token_bytes
+from codebook import codebook_for
 from soln_8 import is_ecb
 from tools import decode_base64, pad
+from instrument import stage, timed
+
+# Candidate bytes for the target, most frequent in English text first,
+# followed by every remaining byte value.
+english_order = bytearray(b" etaoinshrdlcumwfgypbvkjxqzETAOINSHRDLCUMWFGYPBVKJXQZ\n.,'\"-?!;:0123456789")
+english_order += bytes(c for c in range(256) if c not in english_order)
+english_order = bytes(english_order)
 
 class Oracle:
     """
@@ -25,6 +33,22 @@ class Oracle:
         full_ptxt = pad(full_ptxt, self.blocksize)
         return self.cipher.encrypt(full_ptxt)
 
+    def enc_many(self, ptxts: list[bytes]):
+        """
+        Encrypts a batch of plaintexts exactly as enc would, returning a list
+        of ciphertexts. ECB encrypts every block independently, so the whole
+        batch is padded into one buffer and encrypted in a single call.
+        """
+        full_ptxts = [pad(ptxt + self.suffix, self.blocksize) for ptxt in ptxts]
+        ctxt = self.cipher.encrypt(b"".join(full_ptxts))
+        ctxts = []
+        start = 0
+        for full_ptxt in full_ptxts:
+            ctxts.append(ctxt[start: start + len(full_ptxt)])
+            start += len(full_ptxt)
+        return ctxts
+
+@timed()
 def get_sizes(oracle: Oracle):
     """
     Find block size and target size by encrypting increasingly large strings.
@@ -42,30 +66,36 @@ def get_sizes(oracle: Oracle):
     unknown_size = last_size - len(test_str)
     return unknown_size, blocksize
 
-def create_dictionary_at(oracle: Oracle, blocksize: int, idx: int, known_ptxt_prefix: bytes):
+@timed()
+def create_dictionary_at(oracle: Oracle, blocksize: int, idx: int, known_ptxt_prefix: bytes, codebook=None):
     """
     Given the known target plaintext up to a certain index, encrypts blocks containing
     the known plaintext followed by a possible byte to return a dictionary from
-    blocks of ciphertext to the final byte used.
+    blocks of ciphertext to the final byte used. All 256 candidates are sent to
+    the oracle as one batch. If a codebook is given, only candidate blocks it does
+    not already hold are encrypted, packed into a single query.
     """
     bdict = {}
     known_pad = b"A" * (blocksize - (idx % blocksize) - 1)
-    known_prefix = bytearray(known_pad)
-    known_prefix += known_ptxt_prefix
-    for c in range(256):
-        known_prefix.append(c)
-        ctxt = oracle.enc(known_prefix)
-        block_start = (idx // blocksize) * blocksize
+    known_prefix = known_pad + known_ptxt_prefix
+    if codebook is not None:
+        known = known_prefix[len(known_prefix) - blocksize + 1:]
+        return codebook.dictionary(known, lambda blocks: oracle.enc(blocks)[:len(blocks)])
+    ctxts = oracle.enc_many([known_prefix + bytes([c]) for c in range(256)])
+    block_start = (idx // blocksize) * blocksize
+    for c, ctxt in enumerate(ctxts):
         block = ctxt[block_start: block_start + blocksize]
         bdict[block] = c
-        known_prefix.pop()
     return bdict
 
-def decrypt_target(oracle: Oracle):
+@timed()
+def decrypt_target(oracle: Oracle, codebook=None):
     """
     Returns the plaintext string that the oracle appends to the end of messages.
     Decrypts a byte at a time by aligning it at the end of a block and looking up the
     block of ciphertext in a dictionary between ciphertexts and known last bytes.
+    If a codebook for the oracle is given, it is filled from every ciphertext with
+    known plaintext, and blocks it already holds need no dictionary queries.
     """
     target_size, blocksize = get_sizes(oracle)
     if not is_ecb(oracle.enc(bytes(2 * blocksize))):
@@ -73,15 +103,127 @@ def decrypt_target(oracle: Oracle):
     
     ptxt = bytearray()
     for i in range(target_size):
-        bdict = create_dictionary_at(oracle, blocksize, i, bytes(ptxt))
         block_start = (i // blocksize) * blocksize
         prefix = b"A" * (blocksize - (i % blocksize) - 1)
-        ctxt = oracle.enc(prefix)
+        with stage("soln_12.decrypt_target.query", len(prefix)):
+            ctxt = oracle.enc(prefix)
         block = ctxt[block_start:block_start + 16]
+        if codebook is not None:
+            codebook.learn(prefix + ptxt, ctxt)
+            ptxt_block = codebook.decrypt_block(block)
+            if ptxt_block is not None:
+                ptxt.append(ptxt_block[-1])
+                continue
+        bdict = create_dictionary_at(oracle, blocksize, i, bytes(ptxt), codebook)
         ptxt.append(bdict[block])
     return bytes(ptxt)
 
+async def get_sizes_async(oracle):
+    """Finds block size and target size like get_sizes, using an async oracle."""
+    test_str = b""
+    last_size = len(await oracle.enc(test_str))
+    next_size = last_size
+    while next_size == last_size:
+        test_str += b"A"
+        next_size = len(await oracle.enc(test_str))
+    blocksize = next_size - last_size
+    unknown_size = last_size - len(test_str)
+    return unknown_size, blocksize
+
+async def create_dictionary_at_async(oracle, blocksize: int, idx: int, known_ptxt_prefix: bytes):
+    """
+    Builds the same dictionary as create_dictionary_at, issuing all 256
+    queries to an async oracle at once.
+    """
+    import asyncio
+    bdict = {}
+    known_prefix = b"A" * (blocksize - (idx % blocksize) - 1) + known_ptxt_prefix
+    ctxts = await asyncio.gather(*(oracle.enc(known_prefix + bytes([c])) for c in range(256)))
+    block_start = (idx // blocksize) * blocksize
+    for c, ctxt in enumerate(ctxts):
+        block = ctxt[block_start: block_start + blocksize]
+        bdict[block] = c
+    return bdict
+
+async def decrypt_target_async(oracle, concurrency: int = 32, retries: int = 3, backoff: float = 0.05):
+    """
+    Decrypts the target like decrypt_target against an oracle whose enc is a
+    coroutine. The dictionary queries for each byte and the query for the
+    byte itself are in flight together, up to concurrency at a time, and
+    failed queries are retried with exponential backoff.
+    """
+    import asyncio
+    from oracle_harness import ThrottledOracle
+    oracle = ThrottledOracle(oracle, concurrency, retries, backoff)
+    target_size, blocksize = await get_sizes_async(oracle)
+    if not is_ecb(await oracle.enc(bytes(2 * blocksize))):
+        raise ValueError("Not ECB!")
+
+    ptxt = bytearray()
+    for i in range(target_size):
+        prefix = b"A" * (blocksize - (i % blocksize) - 1)
+        bdict, ctxt = await asyncio.gather(
+            create_dictionary_at_async(oracle, blocksize, i, bytes(ptxt)),
+            oracle.enc(prefix),
+        )
+        block_start = (i // blocksize) * blocksize
+        ptxt.append(bdict[ctxt[block_start: block_start + blocksize]])
+    return bytes(ptxt)
+
+@timed()
+def decrypt_target_cached(oracle: Oracle, alphabet: bytes = english_order, per_query: int = 16):
+    """
+    Decrypts the target like decrypt_target, but with far fewer oracle
+    queries. Only blocksize different paddings are ever needed, so the
+    ciphertext for each one is requested once, while finding the sizes,
+    and reused for every target byte it aligns. Candidate bytes are tried
+    in alphabet order, per_query candidate blocks to a query, stopping at
+    the first match. Returns the plaintext and the number of queries made.
+    """
+    queries = 0
+
+    def enc(ptxt: bytes):
+        nonlocal queries
+        queries += 1
+        return oracle.enc(ptxt)
+
+    aligned_ctxts = [enc(b"")]
+    while len(aligned_ctxts[-1]) == len(aligned_ctxts[0]):
+        aligned_ctxts.append(enc(b"A" * len(aligned_ctxts)))
+    blocksize = len(aligned_ctxts[-1]) - len(aligned_ctxts[0])
+    target_size = len(aligned_ctxts[0]) - (len(aligned_ctxts) - 1)
+    while len(aligned_ctxts) < blocksize:
+        aligned_ctxts.append(enc(b"A" * len(aligned_ctxts)))
+
+    if not is_ecb(enc(bytes(2 * blocksize))):
+        raise ValueError("Not ECB!")
+
+    ptxt = bytearray(b"A" * (blocksize - 1))
+    for i in range(target_size):
+        ctxt = aligned_ctxts[blocksize - (i % blocksize) - 1]
+        block_start = (i // blocksize) * blocksize
+        target_block = ctxt[block_start: block_start + blocksize]
+        known = bytes(ptxt[-(blocksize - 1):])
+
+        for start in range(0, len(alphabet), per_query):
+            batch = alphabet[start: start + per_query]
+            cands = enc(b"".join(known + bytes([c]) for c in batch))
+            match = next((
+                c for j, c in enumerate(batch)
+                if cands[j * blocksize: (j + 1) * blocksize] == target_block
+            ), None)
+            if match is not None:
+                ptxt.append(match)
+                break
+        else:
+            raise ValueError(f"No candidate matched target byte {i}")
+
+    return bytes(ptxt[blocksize - 1:]), queries
+
 if __name__ == "__main__":
+    import asyncio
+    from oracle_harness import AsyncOracle
+
     oracle = Oracle()
     ptxt = decrypt_target(oracle)
     assert(ptxt == decode_base64(
@@ -91,3 +233,15 @@ if __name__ == "__main__":
         "YnkK"
     ))
     print(ptxt)
+
+    codebook = codebook_for(oracle)
+    assert(decrypt_target(oracle, codebook) == ptxt)
+    assert(decrypt_target(oracle, codebook) == ptxt)
+    print(f"Codebook: {codebook.stats()}")
+
+    cached_ptxt, queries = decrypt_target_cached(oracle)
+    assert(cached_ptxt == ptxt)
+    print(f"Decrypted with {queries} queries")
+
+    async_oracle = AsyncOracle(oracle, latency=0.001, failure_rate=0.01, seed=0)
+    assert(asyncio.run(decrypt_target_async(async_oracle, concurrency=64, backoff=0.001)) == ptxt)
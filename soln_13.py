@@ -1,17 +1,20 @@
 from Crypto.Cipher import AES
+from collections import OrderedDict
 from secrets import token_bytes
-from tools import pad
+from padding import PADDING, unpad
 
 class Oracle:
     """
     Creates and encrypts profiles made up of three key-value pairs:
     email, uid, and role.
     """
-    def __init__(self, keysize: int = 16):
+    def __init__(self, keysize: int = 16, cache_size: int = 0):
         self.blocksize = keysize
         self.key = token_bytes(keysize)
         self.cipher = AES.new(self.key, AES.MODE_ECB)
         self.uid = 0
+        self.cache_size = cache_size
+        self.profiles = OrderedDict()
 
     def profile_for(self, email: str):
         """
@@ -19,20 +22,56 @@ class Oracle:
         removing metacharacters & and =.
         """
         self.uid += 1
-        email = email.replace("&", "").replace("=", "")
-        return f"email={email}&uid={self.uid}&role=user"
+        profile = encode_profile(email.encode('utf-8'), self.uid, self.blocksize)
+        return str(unpad(profile, self.blocksize), "utf-8")
     
     def enc_profile(self, email: str):
         """Given an email, creates a profile and encrypts it."""
-        profile = self.profile_for(email)
-        full_ptxt = pad(profile.encode('utf-8'), self.blocksize)
+        self.uid += 1
+        full_ptxt = encode_profile(email.encode('utf-8'), self.uid, self.blocksize)
         return self.cipher.encrypt(full_ptxt)
 
     def dec_profile(self, ctxt: bytes):
-        """Decrypts a profile to a key-value string, removing padding."""
+        """Decrypts a profile to a key-value string, validating and removing padding."""
+        ptxt = self.cipher.decrypt(ctxt)
+        return str(unpad(ptxt, self.blocksize), "utf-8")
+
+    def dec_parse_profile(self, ctxt: bytes):
+        """
+        Decrypts a profile and parses it to a dictionary of bytes. The most
+        recent cache_size results are cached by ciphertext, and are shared
+        between callers, so they should not be modified.
+        """
+        if not self.cache_size:
+            return self.parse_profile(ctxt)
+        key = bytes(ctxt)
+        profile = self.profiles.get(key)
+        if profile is not None:
+            self.profiles.move_to_end(key)
+            return profile
+        profile = self.profiles[key] = self.parse_profile(key)
+        if len(self.profiles) > self.cache_size:
+            self.profiles.popitem(last=False)
+        return profile
+
+    def parse_profile(self, ctxt: bytes):
+        """Decrypts a profile and parses it to a dictionary of bytes, uncached."""
         ptxt = self.cipher.decrypt(ctxt)
-        padding = ptxt[-1]
-        return ptxt[:-padding].decode("utf-8")
+        return parse_key_value_bytes(unpad(ptxt, self.blocksize).tobytes())
+
+# Bytes a profile adds around the email and uid.
+PROFILE_OVERHEAD = len(b"email=&uid=&role=user")
+
+def encode_profile(email: bytes, uid: int, blocksize: int):
+    """
+    Encodes a profile as key=value pairs, removing metacharacters & and =
+    from the email, and returns it PKCS#7 padded, built in one allocation.
+    """
+    email = email.translate(None, b"&=")
+    uid = b"%d" % uid
+    size = PROFILE_OVERHEAD + len(email) + len(uid)
+    padding = PADDING[blocksize - size % blocksize]
+    return b"".join((b"email=", email, b"&uid=", uid, b"&role=user", padding))
 
 def parse_key_value(pairs: str):
     """Parses key-value string to a dictionary."""
@@ -42,7 +81,18 @@ def parse_key_value(pairs: str):
         for t in tokens:
             key, val = t.split('=')
             vals[key] = val
-    except:
+    except ValueError:
+        raise ValueError("Invalid key=value")
+    return vals
+
+def parse_key_value_bytes(pairs: bytes):
+    """Parses key-value bytes to a dictionary of bytes without decoding them."""
+    vals = {}
+    try:
+        for t in pairs.split(b"&"):
+            key, val = t.split(b"=")
+            vals[key] = val
+    except ValueError:
         raise ValueError("Invalid key=value")
     return vals
 
@@ -89,4 +139,5 @@ if __name__ == "__main__":
     enc_profile = build_enc_admin_profile(oracle)
     profile = parse_key_value(oracle.dec_profile(enc_profile))
     assert(profile["role"] == "admin")
+    assert(oracle.dec_parse_profile(enc_profile)[b"role"] == b"admin")
     print(profile)
\ No newline at end of file
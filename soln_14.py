@@ -1,19 +1,22 @@
 from Crypto.Cipher import AES
 import secrets
+from codebook import codebook_for
 from soln_8 import is_ecb
 from tools import decode_base64, pad
+from instrument import stage, timed
 
 class Oracle:
     """
     Oracle that encrypts plaintexts under AES-ECB with a random key, after
     prepending random bytes and appending a target string. The key and the prefix
-    are generated at initialization. The prefix is shorter than a block.
+    are generated at initialization. The prefix is shorter than max_prefix bytes,
+    which defaults to two blocks.
     """
-    def __init__(self, keysize: int):
+    def __init__(self, keysize: int, max_prefix: int = None):
         self.blocksize = keysize
         self.key = secrets.token_bytes(keysize)
         self.cipher = AES.new(self.key, AES.MODE_ECB)
-        prefix_size = secrets.randbelow(2 * keysize)
+        prefix_size = secrets.randbelow(max_prefix or 2 * keysize)
         self.prefix = secrets.token_bytes(prefix_size)
         self.suffix = decode_base64(
             "Um9sbGluJyBpbiBteSA1LjAKV2l0aCBteSByYWctdG9wIGRvd24gc28gbXkg"
@@ -31,12 +34,28 @@ class Oracle:
         full_ptxt = pad(full_ptxt, self.blocksize)
         return self.cipher.encrypt(full_ptxt)
 
+    def enc_many(self, ptxts: list[bytes]):
+        """
+        Encrypts a batch of plaintexts exactly as enc would, returning a list
+        of ciphertexts. ECB encrypts every block independently, so the whole
+        batch is padded into one buffer and encrypted in a single call.
+        """
+        full_ptxts = [pad(self.prefix + ptxt + self.suffix, self.blocksize) for ptxt in ptxts]
+        ctxt = self.cipher.encrypt(b"".join(full_ptxts))
+        ctxts = []
+        start = 0
+        for full_ptxt in full_ptxts:
+            ctxts.append(ctxt[start: start + len(full_ptxt)])
+            start += len(full_ptxt)
+        return ctxts
+
 def get_lengths(oracle: Oracle):
     """
     Find block size by encrypting increasingly large strings. Compare ciphertexts
     to find the block where the prefix ends and our input starts. Then encrypt
     increasingly large strings until our input makes up two identical blocks of
     ciphertext to find the prefix length. Subtract to find the length of the target.
+    Kept as the slow reference for get_lengths_fast, which decrypt_target uses.
     """
     test_str = b""
     base_size = len(oracle.enc(test_str))
@@ -68,33 +87,125 @@ def get_lengths(oracle: Oracle):
     target_length = next_size - prefix_length - len(test_str) - blocksize
     return prefix_length, target_length, blocksize
     
-def create_dictionary_at(oracle: Oracle, blocksize: int, prefix_length: int, target_idx: int, known_target_prefix: bytes):
+def find_blocksize(oracle: Oracle, min_blocksize: int = 8, max_blocksize: int = 64):
+    """
+    Find block size with a single query. A run of identical bytes three times
+    the largest block size always covers two identical aligned blocks, so the
+    smallest size at which the ciphertext has two equal adjacent blocks is the
+    block size.
+    """
+    ctxt = oracle.enc(b"A" * (3 * max_blocksize))
+    for blocksize in range(min_blocksize, max_blocksize + 1):
+        if len(ctxt) % blocksize != 0:
+            continue
+        for i in range(0, len(ctxt) - blocksize, blocksize):
+            if ctxt[i: i + blocksize] == ctxt[i + blocksize: i + 2 * blocksize]:
+                return blocksize
+    raise ValueError("No repeated blocks found")
+
+@timed()
+def get_lengths_fast(oracle: Oracle):
+    """
+    Finds the same lengths as get_lengths with a constant number of queries.
+    A single probe holds one run of two blocks of a distinct byte for each
+    possible alignment, each run one byte further along than the last. Only
+    the run that starts on a block boundary encrypts to two equal adjacent
+    blocks, found by indexing the ciphertext blocks in a dictionary. Comparing
+    against a query whose first byte differs from the probe's gives the block
+    the input starts in, which pins down which run aligned and so the prefix
+    length. The target length comes from a binary search for the input
+    length at which a block is added. Works for prefixes of any length, and
+    raises ValueError if no run aligns.
+    """
+    blocksize = find_blocksize(oracle)
+    base = oracle.enc(b"")
+
+    # Each run is followed by a separator, and the probe also starts with
+    # one, so the end of the prefix can never extend a run.
+    run_length = 2 * blocksize + 1
+    probe = b"\x00" + b"".join(bytes([j + 1]) * (2 * blocksize) + b"\x00" for j in range(blocksize))
+    ctxt = oracle.enc(probe)
+
+    # The two inputs differ in their first byte, so the first block that
+    # differs is the one the input starts in, whatever follows the prefix.
+    other = oracle.enc(b"\xff")
+    input_start_block = next(
+        i // blocksize for i in range(0, len(ctxt), blocksize)
+        if ctxt[i: i + blocksize] != other[i: i + blocksize]
+    )
+
+    block_indices = {}
+    aligned_block = -1
+    # Blocks before the input are skipped, in case the prefix itself has
+    # two equal adjacent blocks.
+    for i in range(input_start_block * blocksize, len(ctxt), blocksize):
+        block_idx = i // blocksize
+        block = ctxt[i: i + blocksize]
+        if block_indices.get(block) == block_idx - 1:
+            aligned_block = block_idx - 1
+            break
+        block_indices[block] = block_idx
+    if aligned_block < 0:
+        raise ValueError("Not ECB!")
+
+    # The run starting at the aligned block is the j-th, and only one j puts
+    # the prefix end inside the block where the input starts.
+    for j in range(blocksize):
+        cand = aligned_block * blocksize - j * run_length - 1
+        if cand >= 0 and cand // blocksize == input_start_block:
+            prefix_length = cand
+            break
+    else:
+        raise ValueError("No run aligned with the start of the input")
+
+    # Smallest input length that adds a block of padding.
+    low, high = 1, blocksize
+    while low < high:
+        mid = (low + high) // 2
+        if len(oracle.enc(b"A" * mid)) > len(base):
+            high = mid
+        else:
+            low = mid + 1
+    target_length = len(base) - prefix_length - low
+    return prefix_length, target_length, blocksize
+
+@timed()
+def create_dictionary_at(oracle: Oracle, blocksize: int, prefix_length: int, target_idx: int, known_target_prefix: bytes, codebook=None):
     """
     Given the known target plaintext up to a certain index, encrypts blocks containing
     the known plaintext followed by a possible byte to return a dictionary from
-    blocks of ciphertext to the final byte used.
+    blocks of ciphertext to the final byte used. All 256 candidates are sent to
+    the oracle as one batch. If a codebook is given, only candidate blocks it does
+    not already hold are encrypted, packed into a single query.
     """
     bdict = {}
     prefix_fill = b"A" * (blocksize - prefix_length % blocksize)
     known_pad = b"A" * (blocksize - target_idx % blocksize - 1)
-    known_fill = bytearray(prefix_fill + known_pad + known_target_prefix)
+    known_fill = prefix_fill + known_pad + known_target_prefix
     known_start = prefix_length + len(prefix_fill)
+    if codebook is not None:
+        known = known_fill[len(known_fill) - blocksize + 1:]
+        return codebook.dictionary(
+            known,
+            lambda blocks: oracle.enc(prefix_fill + blocks)[known_start: known_start + len(blocks)],
+        )
     block_start = known_start + (target_idx // blocksize) * blocksize
-    for c in range(256):
-        known_fill.append(c)
-        ctxt = oracle.enc(known_fill)
+    ctxts = oracle.enc_many([known_fill + bytes([c]) for c in range(256)])
+    for c, ctxt in enumerate(ctxts):
         block = ctxt[block_start: block_start + blocksize]
         bdict[block] = c
-        known_fill.pop()
     return bdict
 
-def decrypt_target(oracle):
+@timed()
+def decrypt_target(oracle, codebook=None):
     """
     Returns the plaintext string that the oracle appends to the end of messages.
     Decrypts a byte at a time by aligning it at the end of a block and looking up the
     block of ciphertext in a dictionary between ciphertexts and known last bytes.
+    If a codebook for the oracle is given, it is filled from every ciphertext with
+    known plaintext, and blocks it already holds need no dictionary queries.
     """
-    prefix_length, suffix_length, blocksize = get_lengths(oracle)
+    prefix_length, suffix_length, blocksize = get_lengths_fast(oracle)
 
     if not is_ecb(oracle.enc(bytes(3 * blocksize))):
         raise ValueError("Not ECB!")
@@ -103,15 +214,107 @@ def decrypt_target(oracle):
     prefix_fill = b"A" * (blocksize - prefix_length % blocksize)
     known_start = prefix_length + len(prefix_fill)
     for i in range(suffix_length):
-        bdict = create_dictionary_at(oracle, blocksize, prefix_length, i, bytes(target))
         known_fill = prefix_fill + b"A" * (blocksize - i % blocksize - 1)
         block_start = known_start + (i // blocksize) * blocksize
-        ctxt = oracle.enc(known_fill)
+        with stage("soln_14.decrypt_target.query", len(known_fill)):
+            ctxt = oracle.enc(known_fill)
         block = ctxt[block_start: block_start + blocksize]
+        if codebook is not None:
+            codebook.learn(known_fill + target, ctxt, prefix_length)
+            ptxt_block = codebook.decrypt_block(block)
+            if ptxt_block is not None:
+                target.append(ptxt_block[-1])
+                continue
+        bdict = create_dictionary_at(oracle, blocksize, prefix_length, i, bytes(target), codebook)
         target.append(bdict[block])
     
     return bytes(target)
+
+async def get_lengths_async(oracle):
+    """
+    Finds prefix length, target length and block size like get_lengths,
+    using an async oracle. The probes for the prefix length do not depend
+    on each other, so they are all in flight at once.
+    """
+    import asyncio
+    test_str = b""
+    base_size = len(await oracle.enc(test_str))
+    next_size = base_size
+    while next_size == base_size:
+        test_str += b"A"
+        next_size = len(await oracle.enc(test_str))
+    blocksize = next_size - base_size
+
+    ctxt_1, ctxt_2 = await asyncio.gather(oracle.enc(b""), oracle.enc(b"A"))
+
+    input_start_block = -1
+    for i in range(0, len(ctxt_2), blocksize):
+        if ctxt_1[i: i + blocksize] != ctxt_2[i: i + blocksize]:
+            input_start_block = i
+            break
+
+    ctxts = await asyncio.gather(*(oracle.enc(b"A" * (2 * blocksize + i)) for i in range(blocksize + 1)))
+    prefix_length = -1
+    block1_start = input_start_block + blocksize
+    for i, ctxt in enumerate(ctxts):
+        block1 = ctxt[block1_start: block1_start + blocksize]
+        block2 = ctxt[block1_start + blocksize: block1_start + 2 * blocksize]
+        if block1 == block2:
+            prefix_length = block1_start - i
+            break
+    target_length = next_size - prefix_length - len(test_str) - blocksize
+    return prefix_length, target_length, blocksize
+
+async def create_dictionary_at_async(oracle, blocksize: int, prefix_length: int, target_idx: int, known_target_prefix: bytes):
+    """
+    Builds the same dictionary as create_dictionary_at, issuing all 256
+    queries to an async oracle at once.
+    """
+    import asyncio
+    bdict = {}
+    prefix_fill = b"A" * (blocksize - prefix_length % blocksize)
+    known_pad = b"A" * (blocksize - target_idx % blocksize - 1)
+    known_fill = prefix_fill + known_pad + known_target_prefix
+    block_start = prefix_length + len(prefix_fill) + (target_idx // blocksize) * blocksize
+    ctxts = await asyncio.gather(*(oracle.enc(known_fill + bytes([c])) for c in range(256)))
+    for c, ctxt in enumerate(ctxts):
+        block = ctxt[block_start: block_start + blocksize]
+        bdict[block] = c
+    return bdict
+
+async def decrypt_target_async(oracle, concurrency: int = 32, retries: int = 3, backoff: float = 0.05):
+    """
+    Decrypts the target like decrypt_target against an oracle whose enc is a
+    coroutine. The dictionary queries for each byte and the query for the
+    byte itself are in flight together, up to concurrency at a time, and
+    failed queries are retried with exponential backoff.
+    """
+    import asyncio
+    from oracle_harness import ThrottledOracle
+    oracle = ThrottledOracle(oracle, concurrency, retries, backoff)
+    prefix_length, suffix_length, blocksize = await get_lengths_async(oracle)
+
+    if not is_ecb(await oracle.enc(bytes(3 * blocksize))):
+        raise ValueError("Not ECB!")
+
+    target = bytearray()
+    prefix_fill = b"A" * (blocksize - prefix_length % blocksize)
+    known_start = prefix_length + len(prefix_fill)
+    for i in range(suffix_length):
+        known_fill = prefix_fill + b"A" * (blocksize - i % blocksize - 1)
+        bdict, ctxt = await asyncio.gather(
+            create_dictionary_at_async(oracle, blocksize, prefix_length, i, bytes(target)),
+            oracle.enc(known_fill),
+        )
+        block_start = known_start + (i // blocksize) * blocksize
+        target.append(bdict[ctxt[block_start: block_start + blocksize]])
+
+    return bytes(target)
+
 if __name__ == "__main__":
+    import asyncio
+    from oracle_harness import AsyncOracle
+
     oracle = Oracle(16)
     res = decrypt_target(oracle)
     assert(res == decode_base64(
@@ -120,4 +323,15 @@ if __name__ == "__main__":
         "dXN0IHRvIHNheSBoaQpEaWQgeW91IHN0b3A/IE5vLCBJIGp1c3QgZHJvdmUg"  
         "YnkK"
     ))
-    print(res)
\ No newline at end of file
+    print(res)
+
+    codebook = codebook_for(oracle)
+    assert(decrypt_target(oracle, codebook) == res)
+    assert(decrypt_target(oracle, codebook) == res)
+    print(f"Codebook: {codebook.stats()}")
+
+    long_prefix_oracle = Oracle(16, max_prefix=1000)
+    assert(get_lengths_fast(long_prefix_oracle)[0] == len(long_prefix_oracle.prefix))
+
+    async_oracle = AsyncOracle(oracle, latency=0.001, failure_rate=0.01, seed=0)
+    assert(asyncio.run(decrypt_target_async(async_oracle, concurrency=64, backoff=0.001)) == res)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from Crypto.Cipher import AES
 import secrets
+from padding import unpad
 from tools import xor_buffers, pad
 class Oracle:
     """
@@ -7,11 +8,10 @@ class Oracle:
     prefix and suffix.
     """
     def __init__(self):
-        key = secrets.token_bytes(16)
-        self.enc_cipher = AES.new(key, AES.MODE_CBC)
+        self.key = secrets.token_bytes(16)
+        self.iv = secrets.token_bytes(16)
         self.prefix = b"comment1=cooking%20MCs;userdata="
         self.suffix = b";comment2=%20like%20a%20pound%20of%20bacon"
-        self.dec_cipher = AES.new(key, AES.MODE_CBC, self.enc_cipher.iv)
 
     def enc(self, ptxt: str):
         """
@@ -20,34 +20,163 @@ class Oracle:
         """
         ptxt = ptxt.replace(";", "%27").replace("=", "%3D")
         full_ptxt = self.prefix + ptxt.encode("utf-8") + self.suffix
-        return self.enc_cipher.encrypt(pad(full_ptxt, 16))
+        cipher = AES.new(self.key, AES.MODE_CBC, self.iv)
+        return cipher.encrypt(pad(full_ptxt, 16))
 
     def is_admin(self, ctxt: bytes):
-        """Decrypts the given ciphertext and checks if it is admin."""
-        ptxt_padded = self.dec_cipher.decrypt(ctxt)
-        padding_amount = ptxt_padded[-1]
-        ptxt = ptxt_padded[:-padding_amount]
-        return b";admin=true;" in ptxt
+        """
+        Decrypts the given ciphertext and checks if it is admin. Raises
+        ValueError if the padding is invalid.
+        """
+        cipher = AES.new(self.key, AES.MODE_CBC, self.iv)
+        ptxt_padded = cipher.decrypt(ctxt)
+        ptxt = unpad(ptxt_padded, 16)
+        return b";admin=true;" in ptxt.tobytes()
+
+# Filler character for the attacker-controlled input. Its bytes are never
+# escaped, and FLIP maps a payload byte to its XOR difference with it.
+FILLER = "A"
+FLIP = bytes(c ^ ord(FILLER) for c in range(256))
 
-def build_admin_ctxt(oracle: Oracle):
+def first_diff_block(a: bytes, b: bytes, blocksize: int):
+    """Returns the index of the first block where two ciphertexts differ."""
+    for i in range(0, min(len(a), len(b)), blocksize):
+        if a[i: i + blocksize] != b[i: i + blocksize]:
+            return i // blocksize
+    return min(len(a), len(b)) // blocksize
+
+def get_layout(oracle: Oracle, max_blocksize: int = 64):
     """
-    Builds a ciphertext of a message containing ;admin=true; by
-    XORing the previous block with the difference between normal
-    and admin plaintexts. Assumes block size and start position of
-    input are known.
+    Finds the block size and the prefix and suffix lengths around the input.
+    The block size comes from a binary search for the input length at which
+    a block is added. As the oracle always starts from the same IV, two inputs
+    sharing their first bytes encrypt to the same blocks until the block
+    where they first differ. A difference after k filler bytes moves into the
+    next block once k fills the block the prefix ends in, which is found by a
+    binary search on k. Returns (blocksize, prefix length, suffix length).
     """
+    base_len = len(oracle.enc(""))
+    lo, hi = 1, max_blocksize
+    grown = None
+    while lo < hi:
+        mid = (lo + hi) // 2
+        ctxt_len = len(oracle.enc(FILLER * mid))
+        if ctxt_len > base_len:
+            hi = mid
+            grown = ctxt_len
+        else:
+            lo = mid + 1
+    if grown is None:
+        grown = len(oracle.enc(FILLER * lo))
+    blocksize = grown - base_len
+    prefix_and_suffix = base_len - lo
 
-    normal = "nothing to see here this is good" # 32 characters
-    malicious = "abcde;admin=true" # 16 characters
+    reference = oracle.enc(FILLER * (blocksize + 1))
+    def diff_block(k: int):
+        return first_diff_block(oracle.enc(FILLER * k + "B"), reference, blocksize)
 
-    base_ctxt = oracle.enc(normal)
-    diff = xor_buffers(normal[16:].encode("utf-8"), malicious.encode("utf-8"))
-    
-    modified_block = xor_buffers(base_ctxt[32:48], diff)
-    return base_ctxt[:32] + modified_block + base_ctxt[48:]
+    prefix_block = diff_block(0)
+    lo, hi = 1, blocksize
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if diff_block(mid) > prefix_block:
+            hi = mid
+        else:
+            lo = mid + 1
+    prefix_len = (prefix_block + 1) * blocksize - lo
+    return blocksize, prefix_len, prefix_and_suffix - prefix_len
+
+def plan_forgery(layout: tuple, payload_len: int, skew: int = 0):
+    """
+    Plans where a payload goes in the plaintext. Flipping bits in one
+    ciphertext block flips the same bits in the next plaintext block and
+    garbles the plaintext of the flipped block, so the payload is laid out
+    in carrier blocks, each preceded by a sacrificed block of filler. The
+    first carrier starts the payload skew bytes into the block and later
+    carriers continue it from their first byte. Everything is placed after
+    the prefix, so the prefix and suffix stay intact.
+    Returns the filler input to encrypt and a list of (ciphertext offset,
+    payload start, payload end) segments, one per carrier, where each slice
+    of the payload's difference from the filler is XOR'd into the ciphertext.
+    """
+    blocksize, prefix_len, _ = layout
+    if not 0 <= skew < blocksize:
+        raise ValueError("Skew must be within a block")
+
+    sacrificed = -(-prefix_len // blocksize) * blocksize
+    segments = []
+    start = 0
+    offset = skew
+    while start < payload_len:
+        end = min(start + blocksize - offset, payload_len)
+        segments.append((sacrificed + offset, start, end))
+        start = end
+        offset = 0
+        sacrificed += 2 * blocksize
+
+    last = segments[-1] if segments else (sacrificed - blocksize, 0, 0)
+    input_len = last[0] + blocksize + last[2] - last[1] - prefix_len
+    return FILLER * input_len, segments
+
+def forge_many(oracle: Oracle, payloads: list, layout: tuple = None, skew: int = 0):
+    """
+    Forges one ciphertext per payload, each decrypting to the payload placed
+    as planned by plan_forgery. Payloads are bytes and may contain any
+    characters, including the escaped ; and =. All forgeries share one
+    encrypted filler input, so past finding the layout, a whole batch costs
+    a single oracle query. Masks are written into one buffer by slicing and
+    applied to copies of the base ciphertext with a single XOR.
+    """
+    if layout is None:
+        layout = get_layout(oracle)
+    filler, segments = plan_forgery(layout, max(map(len, payloads), default=0), skew)
+    base = oracle.enc(filler)
+
+    size = len(base)
+    masks = bytearray(size * len(payloads))
+    for n, payload in enumerate(payloads):
+        diff = payload.translate(FLIP)
+        for offset, start, end in segments:
+            if start >= len(diff):
+                break
+            end = min(end, len(diff))
+            masks[n * size + offset: n * size + offset + end - start] = diff[start:end]
+
+    forged = xor_buffers(masks, base * len(payloads))
+    return [forged[i: i + size] for i in range(0, len(forged), size)]
+
+def build_admin_ctxt(oracle: Oracle, layout: tuple = None):
+    """
+    Builds a ciphertext of a message containing ;admin=true; by
+    XORing the previous block with the difference between the filler
+    and admin plaintexts.
+    """
+    return forge_many(oracle, [b";admin=true;"], layout)[0]
 
 if __name__ == "__main__":
+    from oracle_harness import MeteredOracle
+
     oracle = Oracle()
     
     admin = build_admin_ctxt(oracle)
-    assert(oracle.is_admin(admin))
\ No newline at end of file
+    assert(oracle.is_admin(admin))
+    # Every call starts from the same IV, so the oracle can be queried repeatedly.
+    assert(oracle.is_admin(build_admin_ctxt(oracle)))
+    assert(not oracle.is_admin(oracle.enc("nothing to see here")))
+
+    metered = MeteredOracle(oracle)
+    layout = get_layout(metered)
+    assert(layout == (16, len(oracle.prefix), len(oracle.suffix)))
+
+    # Payloads of mixed lengths spanning several carriers, at every skew.
+    payloads = [secrets.token_bytes(1 + n % 40) for n in range(1000)]
+    for skew in range(16):
+        _, segments = plan_forgery(layout, 40, skew)
+        for payload, forged in zip(payloads, forge_many(metered, payloads, layout, skew)):
+            ptxt = AES.new(oracle.key, AES.MODE_CBC, oracle.iv).decrypt(forged)
+            assert(ptxt.startswith(oracle.prefix))
+            assert(unpad(ptxt, 16).tobytes().endswith(oracle.suffix))
+            for offset, start, end in segments:
+                carried = payload[start:end]
+                assert(ptxt[offset + 16: offset + 16 + len(carried)] == carried)
+    print(f"Forged {16 * len(payloads)} ciphertexts in {metered.stats.queries} oracle queries")
\ No newline at end of file
@@ -1,7 +1,8 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
 import string
 import math
 from tools import decode_hex, xor_buffers
+from instrument import timed
 
 printable_characters = set(string.printable)
 letter_freq = {
@@ -32,6 +33,11 @@ letter_freq = {
     'q': 0.0012,
     'z': 0.0009,
 }
+# Byte values with uppercase letters folded to lowercase, and whether
+# each byte value is unprintable, precomputed so no per-byte chr() calls
+# are needed.
+folded_bytes = [c + ord('a') - ord('A') if chr(c).isupper() else c for c in range(256)]
+unprintable_bytes = [chr(c) not in printable_characters for c in range(256)]
 
 def get_char_frequencies(ptxt: bytes):
 	"""
@@ -42,10 +48,7 @@ def get_char_frequencies(ptxt: bytes):
 	for c in string.ascii_lowercase:
 		freq_map[ord(c)] = 0
 	for c in ptxt:
-		if chr(c).isupper():
-			freq_map[c + ord('a') - ord('A')] += 1
-		else:
-			freq_map[c] += 1
+		freq_map[folded_bytes[c]] += 1
 	for c in freq_map:
 		freq_map[c] /= len(ptxt)
 	return freq_map
@@ -66,35 +69,65 @@ def count_unprintable(ptxt_freq: bytes):
 	"""Counts unprintable characters in a byte string."""
 	total = 0
 	for c in ptxt_freq:
-		if chr(c) not in printable_characters:
+		if unprintable_bytes[c]:
 			total += ptxt_freq[c]
 	return total
 
-def break_single_char_xor(ctxt: bytes):
+def score_histogram(hist: Counter, msg_len: int, key: int = 0):
+	"""
+	Returns the (score, unprintable) pair of a ciphertext XOR'd with a
+	single-character key, given a histogram of the ciphertext's bytes.
+	Histogram entries are in order of first appearance, so the results
+	are identical to scoring the plaintext directly.
+	"""
+	freq_map = defaultdict(int)
+	for c in string.ascii_lowercase:
+		freq_map[ord(c)] = 0
+	for c, count in hist.items():
+		freq_map[folded_bytes[c ^ key]] += count
+	for c in freq_map:
+		freq_map[c] /= msg_len
+	return get_plaintext_score(freq_map), count_unprintable(freq_map)
+
+def score_plaintext(ptxt: bytes):
+	"""Returns the (score, unprintable) pair of a plaintext."""
+	return score_histogram(Counter(ptxt), len(ptxt))
+
+@timed()
+def get_key_scores(ctxt: bytes):
+	"""
+	Returns the (score, unprintable) pair of every single-character key.
+	Builds one histogram of the ciphertext and permutes it for each key
+	instead of decrypting and recounting the ciphertext 256 times.
+	"""
+	hist = Counter(ctxt)
+	return [score_histogram(hist, len(ctxt), key) for key in range(256)]
+
+@timed()
+def break_single_char_xor(ctxt: bytes, scorer=None):
 	"""
 	Given that the ciphertext was XOR'd against a single character,
-	generates every possible plaintext, scores its similarity to
-	English text, and returns the plaintext with the best score.
-	Breaks ties based on lowest number of unprintable characters.
+	scores every possible plaintext's similarity to English text and
+	returns the plaintext with the best score. Breaks ties based on
+	lowest number of unprintable characters. By default plaintexts are
+	scored by letter frequencies; a scorer such as scoring.NgramScorer
+	can be passed to score them with its key_scores method instead.
 	"""
-	best_plaintext = None
+	key_scores = get_key_scores(ctxt) if scorer is None else scorer.key_scores(ctxt)
 	best_score = float('inf')
 	best_unprintable = float('inf')
 	best_key = None
-	msg_len = len(ctxt)
-	for i in range(256):
-		key = bytes([i] * msg_len)
-		ptxt = xor_buffers(ctxt, key)
-		ptxt_freq = get_char_frequencies(ptxt)
-		score = get_plaintext_score(ptxt_freq)
-		unprintable = count_unprintable(ptxt_freq)
+	for i, (score, unprintable) in enumerate(key_scores):
 		if score < best_score or (score == best_score and unprintable < best_unprintable):
-			best_plaintext = ptxt
 			best_score = score
 			best_unprintable = unprintable
 			best_key = i
+	best_plaintext = xor_buffers(ctxt, bytes([best_key]) * len(ctxt))
 	return best_plaintext, best_key, best_score, best_unprintable
 
 if __name__ == "__main__":
+	from scoring import NgramScorer
+
 	ctxt = decode_hex("1b37373331363f78151b7f2b783431333d78397828372d363c78373e783a393b3736")
-	print(break_single_char_xor(ctxt))
\ No newline at end of file
+	print(break_single_char_xor(ctxt))
+	assert(break_single_char_xor(ctxt, NgramScorer())[1] == break_single_char_xor(ctxt)[1])
\ No newline at end of file
@@ -1,5 +1,9 @@
-from tools import decode_hex
+import sys
+from heapq import heappush, heapreplace
+from tools import chunked, decode_hex, parallel_map
 from soln_3 import break_single_char_xor
+from instrument import timed
+@timed()
 def find_ctxt(cands: list[str]):
 	"""
 	Given a list of hex strings, finds the one most likely to be
@@ -23,7 +27,63 @@ def find_ctxt(cands: list[str]):
 			best_idx = idx
 	return best_idx, best_ptxt, best_key
 
+def break_lines(chunk: list[tuple[int, str]]):
+	"""
+	Breaks every (index, hex string) pair in a chunk. Returns a
+	(score, unprintable, index, key) tuple for each line, along with
+	the best of those tuples and its plaintext.
+	"""
+	results = []
+	best = None
+	best_ptxt = None
+	for idx, line in chunk:
+		ptxt, key, score, unprintable = break_single_char_xor(decode_hex(line.strip()))
+		result = (score, unprintable, idx, key)
+		results.append(result)
+		if best is None or result < best:
+			best = result
+			best_ptxt = ptxt
+	return results, best, best_ptxt
+
+@timed()
+def find_ctxt_batch(lines, top_k: int = 10, chunksize: int = 1000, processes: int = None):
+	"""
+	Batch version of find_ctxt for large inputs. Streams hex strings from
+	a file object or any iterable in chunks and breaks the chunks across
+	a process pool. Returns the same (index, plaintext, key) as find_ctxt,
+	along with the top_k (index, key, score) tuples, best first, which are
+	empty if top_k is 0.
+	"""
+	best = None
+	best_ptxt = None
+	# Max-heap of the top_k lines, with the worst kept at the root.
+	heap = []
+	for results, chunk_best, chunk_ptxt in parallel_map(
+		break_lines, chunked(enumerate(lines), chunksize), processes
+	):
+		if best is None or chunk_best < best:
+			best = chunk_best
+			best_ptxt = chunk_ptxt
+		for score, unprintable, idx, key in results:
+			entry = (-score, -unprintable, -idx, key)
+			if len(heap) < top_k:
+				heappush(heap, entry)
+			elif heap and entry > heap[0]:
+				heapreplace(heap, entry)
+
+	if best is None:
+		return (-1, None, None), []
+	top = [(-idx, key, -score) for score, _, idx, key in sorted(heap, reverse=True)]
+	_, _, best_idx, best_key = best
+	return (best_idx, best_ptxt, best_key), top
+
 if __name__ == '__main__':
-	with open('data/4.txt') as f:
+	path = sys.argv[1] if len(sys.argv) > 1 else 'data/4.txt'
+	with open(path) as f:
 		ctxts = f.read().splitlines()
-	print(find_ctxt(ctxts))
\ No newline at end of file
+	print(find_ctxt(ctxts))
+
+	with open(path) as f:
+		best, top = find_ctxt_batch(f, top_k=5, chunksize=64)
+	assert(best == find_ctxt(ctxts))
+	print(top)
@@ -1,10 +1,65 @@
 from tools import xor_buffers, encode_hex
 import math
+import mmap
+import os
+import stat
+
 def xor_repeating_key(ptxt: bytes, key: bytes):
     """XORs a message with a repeating key."""
     mask = key * math.ceil(len(ptxt) / len(key))
     return xor_buffers(ptxt, mask)
 
+def xor_repeating_key_chunks(chunks, key: bytes, phase: int = 0):
+    """
+    XORs an iterable of message chunks with a repeating key, yielding each
+    output chunk as soon as it is produced. The key phase carries across
+    chunk boundaries, so the joined output equals xor_repeating_key on the
+    joined input. phase is the key position of the first byte.
+    """
+    phase %= len(key)
+    mask = b""
+    for chunk in chunks:
+        # One mask long enough for any phase, reused until a larger chunk arrives.
+        if len(mask) < len(chunk) + len(key):
+            mask = key * (len(chunk) // len(key) + 2)
+        yield xor_buffers(chunk, memoryview(mask)[phase:])
+        phase = (phase + len(chunk)) % len(key)
+
+def iter_file_chunks(f, chunksize: int):
+    """
+    Yields a file object's remaining contents in chunks. Regular files on
+    disk are memory-mapped rather than read through the file's buffer.
+    """
+    try:
+        fileno = f.fileno()
+    except (AttributeError, OSError):
+        fileno = None
+
+    if fileno is not None and stat.S_ISREG(os.fstat(fileno).st_mode):
+        start = f.tell()
+        size = os.fstat(fileno).st_size
+        if size > start:
+            with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as m:
+                for i in range(start, size, chunksize):
+                    yield m[i: i + chunksize]
+            f.seek(size)
+        return
+
+    for chunk in iter(lambda: f.read(chunksize), b""):
+        yield chunk
+
+def xor_repeating_key_file(src, dst, key: bytes, chunksize: int = 1 << 20):
+    """
+    XORs the contents of a binary file object with a repeating key and
+    writes the result to another, one chunk at a time, so memory use does
+    not depend on the file size. Returns the number of bytes written.
+    """
+    total = 0
+    for chunk in xor_repeating_key_chunks(iter_file_chunks(src, chunksize), key):
+        dst.write(chunk)
+        total += len(chunk)
+    return total
+
 if __name__ == "__main__":
     pt = bytes(
         "Burning 'em, if you ain't quick and nimble\n"
@@ -15,4 +70,6 @@ if __name__ == "__main__":
     assert(encode_hex(res).decode("utf-8") == (
         "0b3637272a2b2e63622c2e69692a23693a2a3c6324202d623d63343c2a26226324272765272"
         "a282b2f20430a652e2c652a3124333a653e2b2027630c692b20283165286326302e27282f"
-    ))
\ No newline at end of file
+    ))
+    chunks = [pt[i: i + 7] for i in range(0, len(pt), 7)]
+    assert(b"".join(xor_repeating_key_chunks(chunks, b"ICE")) == res)
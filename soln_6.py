@@ -1,13 +1,24 @@
-from soln_3 import break_single_char_xor
-from soln_5 import xor_repeating_key
-from tools import decode_base64, xor_buffers
+import sys
+from collections import Counter
+from soln_3 import break_single_char_xor, score_histogram
+from soln_5 import xor_repeating_key_chunks
+from ctxt_buffer import CiphertextBuffer, iter_views
+from tools import parallel_map
+from instrument import stage, timed
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(x: int):
+        """Counts the set bits in a non-negative integer."""
+        return bin(x).count("1")
 
 def hamming_distance(a: bytes, b: bytes):
     """Get the number of differing bits between two strings"""
     if len(a) != len(b):
         raise ValueError("Strings must be of the same length")
-    
-    return sum(bin(x).count("1") for x in xor_buffers(a, b))
+
+    return popcount(int.from_bytes(a, "little") ^ int.from_bytes(b, "little"))
 
 def get_keysize(ctxt: bytes):
     """
@@ -32,32 +43,96 @@ def get_keysize(ctxt: bytes):
     
     return min(size_to_distance, key=size_to_distance.get)
 
-def break_repeating_key_xor(ctxt: bytes):
+@timed()
+def rank_keysizes(ctxt: bytes, min_size: int = 2, max_size: int = 40, pair_span: int = 1, sample: int = 1 << 18):
     """
-    Breaks repeating-key XOR by breaking ciphertext into blocks of
-    the guessed size, transposing, then solving as single-character XOR
-    to recover the key. Returns key and plaintext.
+    Ranks candidate sizes of the repeating key by the average normalized
+    edit distance between every block and the next pair_span blocks after
+    it, using the first sample bytes of the ciphertext (all of it if sample
+    is None). Each comparison is a single XOR of the ciphertext, as one big
+    integer, against itself shifted by whole blocks. Returns a list of
+    (keysize, distance) pairs, best first.
     """
-    keysize = get_keysize(ctxt)
-    blocks = [ctxt[i: i + keysize] for i in range(0, len(ctxt), keysize)]
-    blocks_transposed = []
-    for i in range(keysize):
-        block = bytearray()
-        for j in range(len(blocks)):
-            if i < len(blocks[j]):
-                block.append(blocks[j][i])
-        blocks_transposed.append(bytes(block))
-    
-    key = bytearray()
-    for bt in blocks_transposed:
-        best_plaintext, best_key, _, _ = break_single_char_xor(bt)
-        key.append(best_key)
-    key = bytes(key)
-    return key, xor_repeating_key(ctxt, key)
+    data = ctxt if sample is None else ctxt[:sample]
+    size = len(data)
+    whole = int.from_bytes(data, "little")
+
+    ranking = []
+    for keysize in range(min_size, max_size + 1):
+        if 2 * keysize > size:
+            break
+        bits = 0
+        pairs = 0
+        for span in range(1, pair_span + 1):
+            shift = span * keysize
+            if shift >= size:
+                break
+            # Bytes in the top shift positions have no partner, so their
+            # bits are counted by the XOR and subtracted back out.
+            bits += popcount(whole ^ (whole >> 8 * shift)) - popcount(whole >> 8 * (size - shift))
+            pairs += size - shift
+        ranking.append((keysize, bits / pairs))
+
+    ranking.sort(key=lambda item: (item[1], item[0]))
+    return ranking
+
+def shortest_period(key: bytes):
+    """Returns the shortest key that repeats to form the given key."""
+    for size in range(1, len(key)):
+        if len(key) % size == 0 and key[:size] * (len(key) // size) == key:
+            return key[:size]
+    return key
+
+def break_column(column: bytes):
+    """Recovers the key byte of a column that was XOR'd with a single character."""
+    return break_single_char_xor(column)[1]
+
+@timed()
+def break_repeating_key_xor(ctxt: bytes, candidates: int = 3, max_keysize: int = 40, processes: int = None,
+                            chunksize: int = 1 << 20):
+    """
+    Breaks repeating-key XOR by taking the best few guessed key sizes,
+    transposing the ciphertext into one column per key byte for each,
+    then solving every column as single-character XOR across a worker
+    pool. The key whose whole plaintext scores best wins, so a guessed
+    size that is a multiple of the true one still recovers the shortest
+    key. The ciphertext may be a memoryview, such as one from a
+    CiphertextBuffer. Candidate keys are scored by decrypting the
+    ciphertext a chunk at a time into a histogram, and only the winner's
+    plaintext is built, so memory use beyond the ciphertext and the
+    returned plaintext does not grow with its size. Returns key and
+    plaintext, or raises ValueError if the ciphertext is too short.
+    """
+    keysizes = [keysize for keysize, _ in rank_keysizes(ctxt, max_size=max_keysize)[:candidates]]
+    if not keysizes:
+        raise ValueError("Ciphertext too short to rank key sizes")
+    # Columns are copied out one at a time as the pool takes them, so a
+    # memoryview of a mapped file is never copied whole.
+    columns = (bytes(ctxt[i::keysize]) for keysize in keysizes for i in range(keysize))
+    with stage("soln_6.break_columns", len(ctxt) * len(keysizes)):
+        key_bytes = list(parallel_map(break_column, columns, processes))
+
+    best = None
+    start = 0
+    for keysize in keysizes:
+        key = shortest_period(bytes(key_bytes[start: start + keysize]))
+        start += keysize
+        with stage("soln_6.score_keys", len(ctxt)):
+            hist = Counter()
+            for chunk in xor_repeating_key_chunks(iter_views(ctxt, chunksize), key):
+                hist.update(chunk)
+            score, unprintable = score_histogram(hist, len(ctxt))
+        rank = (score, unprintable, len(key))
+        if best is None or rank < best[0]:
+            best = (rank, key)
+
+    _, key = best
+    ptxt = b"".join(xor_repeating_key_chunks(iter_views(ctxt, chunksize), key))
+    return key, ptxt
 
 if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/6.txt'
     assert(hamming_distance(b"this is a test", b"wokka wokka!!!") == 37)
 
-    with open('data/6.txt', 'r') as f:
-        ctxt = decode_base64(f.read())
-    print(break_repeating_key_xor(ctxt))
\ No newline at end of file
+    with CiphertextBuffer.from_base64(path) as ctxt:
+        print(break_repeating_key_xor(ctxt.view))
\ No newline at end of file
@@ -1,12 +1,12 @@
-from tools import decode_base64
+import sys
+from ctxt_buffer import CiphertextBuffer
 from Crypto.Cipher import AES
 
 if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/7.txt'
     key = b'YELLOW SUBMARINE'
 
-    with open('data/7.txt', 'r') as f:
-        ctxt = decode_base64(f.read())
-
+    with CiphertextBuffer.from_base64(path) as ctxt:
         cipher = AES.new(key, AES.MODE_ECB)
-        ptxt = cipher.decrypt(ctxt)
+        ptxt = cipher.decrypt(ctxt.view)
         print(ptxt)
\ No newline at end of file
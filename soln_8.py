@@ -1,22 +1,67 @@
-from tools import decode_hex
+import sys
+from functools import partial
+from tools import chunked, decode_hex, parallel_map
 
-def is_ecb(ctxt: bytes, blocksize: int = 16):
+def is_ecb(ctxt: bytes, blocksize: int = 16, offset: int = 0):
     """
     Guesses if a ciphertext was encrypted with AES in ECB mode
     by checking for repeated blocks. The same plaintext block
     always produces the same ciphertext block under ECB.
+    Blocks are taken from the given offset onwards.
     """
-    blocks = []
-    for i in range(0, len(ctxt), blocksize):
+    blocks = set()
+    for i in range(offset, len(ctxt), blocksize):
         block = ctxt[i:i + blocksize]
         if block in blocks:
             return True
-        blocks.append(block)
+        blocks.add(block)
     return False
 
+def get_repetitions(ctxt: bytes, blocksize: int = 16, offset: int = 0):
+    """
+    Finds repeated blocks in a ciphertext, taking blocks from the given
+    offset onwards. Returns the number of blocks that repeat an earlier
+    one, and a list with the offsets of every repeated block, grouped
+    by block in order of first appearance.
+    """
+    block_offsets = {}
+    for i in range(offset, len(ctxt), blocksize):
+        block_offsets.setdefault(ctxt[i:i + blocksize], []).append(i)
+
+    collisions = [offsets for offsets in block_offsets.values() if len(offsets) > 1]
+    duplicates = sum(len(offsets) - 1 for offsets in collisions)
+    return duplicates, collisions
+
+def score_chunk(chunk: list, blocksize: int, offset: int, is_hex: bool):
+    """
+    Finds repeated blocks in each (index, ciphertext) pair in a chunk.
+    Returns (index, duplicates, collisions) for the ciphertexts that
+    have any.
+    """
+    results = []
+    for idx, ctxt in chunk:
+        if is_hex:
+            ctxt = decode_hex(ctxt.strip())
+        duplicates, collisions = get_repetitions(ctxt, blocksize, offset)
+        if duplicates:
+            results.append((idx, duplicates, collisions))
+    return results
+
+def scan_ecb(ctxts, blocksize: int = 16, offset: int = 0, is_hex: bool = True,
+             chunksize: int = 1000, processes: int = None):
+    """
+    Scans many ciphertexts for repeated blocks, yielding (index, duplicates,
+    collisions) for each ciphertext that has any, in input order. Ciphertexts
+    come from a file object or iterable of hex lines, or of raw bytes if
+    is_hex is False, and are read in chunks spread across a process pool,
+    so memory use does not grow with the size of the corpus.
+    """
+    score = partial(score_chunk, blocksize=blocksize, offset=offset, is_hex=is_hex)
+    for results in parallel_map(score, chunked(enumerate(ctxts), chunksize), processes):
+        yield from results
+
 if __name__ == "__main__":
-    with open('data/8.txt', 'r') as f:
-        for idx, line in enumerate(f.read().splitlines()):
-            ctxt = decode_hex(line)
-            if is_ecb(ctxt):
-                print(f"Possible ECB at line {idx}")
\ No newline at end of file
+    path = sys.argv[1] if len(sys.argv) > 1 else 'data/8.txt'
+    with open(path, 'r') as f:
+        for idx, duplicates, collisions in scan_ecb(f):
+            print(f"Possible ECB at line {idx}: {duplicates} repeated blocks at {collisions}")
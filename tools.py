@@ -1,46 +1,147 @@
-import codecs
+import binascii
 import math
+import os
+from collections import deque
+from instrument import timed
+# pad is re-exported for the solutions that import it from here.
+from padding import PADDING, pad
 
+WHITESPACE = b" \t\r\n\v\f"
+
+@timed()
 def decode_hex(s: str):
   """Decodes a hex string to bytes."""
-  return codecs.decode(s, 'hex')
+  return binascii.unhexlify(s)
 
+@timed()
 def encode_hex(s: bytes):
   """Encodes bytes as a hex string."""
-  return codecs.encode(s, 'hex')
+  return binascii.hexlify(s)
 
+@timed()
 def encode_base64(bs: bytes):
   """Encodes bytes to base64."""
-  b64 = codecs.encode(bs, 'base64').decode()
-  return b64.replace("\n", "")
+  return binascii.b2a_base64(bs, newline=False).decode()
 
+@timed()
 def decode_base64(s: str):
   """Decodes base64 to bytes."""
-  b64 = s.encode('utf-8')
-  return codecs.decode(b64, 'base64')
+  return binascii.a2b_base64(s)
+
+def iter_encoded_chunks(f, group: int, chunksize: int):
+  """
+  Reads encoded text from a text or binary file object in chunks, yielding
+  views of the ASCII bytes with whitespace removed, each a multiple of group
+  characters long except possibly the last.
+  """
+  leftover = b""
+  while True:
+    chunk = f.read(chunksize)
+    if not chunk:
+      break
+    if isinstance(chunk, str):
+      chunk = chunk.encode("ascii")
+    data = chunk.translate(None, WHITESPACE)
+    if leftover:
+      data = leftover + data
+    usable = len(data) - len(data) % group
+    leftover = data[usable:]
+    if usable:
+      yield memoryview(data)[:usable]
+  if leftover:
+    yield leftover
+
+def iter_base64(f, chunksize: int = 1 << 20):
+  """Decodes base64 from a file object incrementally, yielding bytes."""
+  for chunk in iter_encoded_chunks(f, 4, chunksize):
+    yield binascii.a2b_base64(chunk)
 
+def iter_hex(f, chunksize: int = 1 << 20):
+  """Decodes hex from a file object incrementally, yielding bytes."""
+  for chunk in iter_encoded_chunks(f, 2, chunksize):
+    yield binascii.unhexlify(chunk)
+
+def iter_hex_lines(f):
+  """
+  Decodes a file object with one hex string per line, yielding a memoryview
+  of each line's bytes. Only one line is held in memory at a time.
+  """
+  for line in f:
+    yield memoryview(binascii.unhexlify(line.strip()))
+
+@timed()
 def xor_buffers(a: bytes, b: bytes):
-  """XORs two byte strings with each other."""
+  """
+  XORs two byte strings with each other. Both buffers are loaded as
+  single big integers so the XOR runs over whole machine words.
+  """
   if len(a) > len(b):
     raise ValueError("Second buffer must be as long as first")
 
-  return bytes([a[i] ^ b[i] for i in range(len(a))])
+  n = len(a)
+  x = int.from_bytes(a, 'little') ^ int.from_bytes(memoryview(b)[:n], 'little')
+  return x.to_bytes(n, 'little')
+
+@timed()
+def xor_into(out, a: bytes, b: bytes):
+  """
+  XORs two byte strings into the start of a caller-supplied bytearray
+  or writable memoryview, which must be at least as long as the first.
+  Returns the number of bytes written.
+  """
+  if len(a) > len(b):
+    raise ValueError("Second buffer must be as long as first")
+  if len(a) > len(out):
+    raise ValueError("Output buffer must be as long as first")
 
-def pad(msg: bytes, blocksize: int):
-  """Appends PKCS#7 padding to a message for a given block size."""
-  if len(msg) % blocksize == 0:
-      return msg + bytes([blocksize] * blocksize)
-  diff = blocksize - len(msg) % blocksize
-  return msg + bytes([diff] * diff)
+  n = len(a)
+  x = int.from_bytes(a, 'little') ^ int.from_bytes(memoryview(b)[:n], 'little')
+  memoryview(out)[:n] = x.to_bytes(n, 'little')
+  return n
 
 def validate_padding(msg: bytes):
   """Tests if the data is PKCS#7 padded."""
   if not msg:
     return False
   expected_padding_amount = msg[-1]
-  if expected_padding_amount > len(msg):
+  if expected_padding_amount == 0 or expected_padding_amount > len(msg):
     return False
-  for i in range(len(msg) - 1, len(msg) - expected_padding_amount - 1, -1):
-    if msg[i] != expected_padding_amount:
-      return False
-  return True
\ No newline at end of file
+  return msg[len(msg) - expected_padding_amount:] == PADDING[expected_padding_amount]
+
+def chunked(items, size: int):
+  """Groups an iterable into lists of at most size items."""
+  chunk = []
+  for item in items:
+    chunk.append(item)
+    if len(chunk) == size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+def parallel_map(func, items, processes: int = None, window: int = None):
+  """
+  Applies a picklable function to every item across a process pool and
+  yields the results in input order. At most window items are in flight
+  at once, so long iterables are consumed lazily with bounded memory.
+  Runs in the current process if processes is 1, or is None on a machine
+  with a single CPU.
+  """
+  processes = processes or os.cpu_count() or 1
+  if processes == 1:
+    yield from map(func, items)
+    return
+
+  # Deferred so that callers which never start a pool do not pay for
+  # importing multiprocessing.
+  import multiprocessing
+
+  window = window or 2 * processes
+  pending = deque()
+  with multiprocessing.Pool(processes) as pool:
+    for item in items:
+      pending.append(pool.apply_async(func, (item,)))
+      if len(pending) >= window:
+        yield pending.popleft().get()
+    while pending:
+      yield pending.popleft().get()